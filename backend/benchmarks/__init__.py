@@ -0,0 +1,6 @@
+"""Benchmarks for the SaverFwd backend.
+
+Run from the backend directory, e.g. ``python -m benchmarks.chat_contacts``.
+Benchmarks that need MongoDB use a throwaway database (BENCH_DB_NAME) on
+BENCH_MONGO_URL and drop it before seeding, so never point them at real data.
+"""
@@ -0,0 +1,78 @@
+"""GET /api/chat/contacts for a donor with a growing number of contacts.
+
+The query count per call should stay constant as contacts grow.
+
+    python -m benchmarks.chat_contacts --contacts 10 100 500
+"""
+import argparse
+import asyncio
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.common import auth_headers, bench_client, load_server, reset_database, summarize, time_calls
+
+server = load_server()
+
+
+async def seed(contacts, messages_per_contact):
+    """One donor, `contacts` recipients with an order each and a short conversation with each"""
+    rng = random.Random(contacts)
+    now = datetime.now(timezone.utc)
+    donor = server.User(
+        email="bench-donor@example.com", username="bench-donor", full_name="Bench Donor", role="donor"
+    )
+    users, orders, messages = [server.prepare_for_mongo(donor.dict())], [], []
+
+    for index in range(contacts):
+        recipient = server.User(
+            email=f"bench-recipient-{index}@example.com",
+            username=f"bench-recipient-{index}",
+            full_name=f"Recipient {index}",
+            role="recipient",
+        )
+        users.append(server.prepare_for_mongo(recipient.dict()))
+        orders.append(server.prepare_for_mongo(server.Order(
+            food_item_id=str(uuid.uuid4()), recipient_id=recipient.id, donor_id=donor.id, status="confirmed"
+        ).dict()))
+        for offset in range(messages_per_contact):
+            sender, receiver = (donor.id, recipient.id) if rng.random() < 0.5 else (recipient.id, donor.id)
+            messages.append(server.prepare_for_mongo(server.Message(
+                sender_id=sender,
+                receiver_id=receiver,
+                content=f"message {offset}",
+                timestamp=now - timedelta(minutes=rng.randint(0, 60 * 24 * 30)),
+                is_read=rng.random() < 0.7,
+            ).dict()))
+
+    await server.db.users.insert_many(users)
+    await server.db.orders.insert_many(orders)
+    if messages:
+        await server.db.messages.insert_many(messages)
+    return donor
+
+
+async def main(contact_counts, messages_per_contact, iterations):
+    async with bench_client(server) as http:
+        for contacts in contact_counts:
+            await reset_database(server)
+            donor = await seed(contacts, messages_per_contact)
+            headers = auth_headers(server, donor)
+            (await http.get("/api/chat/contacts", headers=headers)).raise_for_status()  # warm up
+
+            samples, commands = await time_calls(lambda: http.get("/api/chat/contacts", headers=headers), iterations)
+            stats = summarize(samples)
+            print(
+                f"contacts={contacts:<5} commands/call={commands:<5.1f} "
+                f"mean={stats['mean_ms']:.2f}ms p95={stats['p95_ms']:.2f}ms p99={stats['p99_ms']:.2f}ms"
+            )
+    server.client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--contacts", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--messages-per-contact", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.contacts, args.messages_per_contact, args.iterations))
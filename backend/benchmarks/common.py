@@ -0,0 +1,91 @@
+"""Shared helpers for the backend benchmarks."""
+import os
+import statistics
+import time
+from collections import Counter
+
+from pymongo import monitoring
+
+BENCH_MONGO_URL = os.environ.get("BENCH_MONGO_URL", "mongodb://localhost:27017")
+BENCH_DB_NAME = os.environ.get("BENCH_DB_NAME", "saverfwd_bench")
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts MongoDB commands sent to the benchmark database, by command name"""
+
+    def __init__(self):
+        self.counts = Counter()
+
+    def started(self, event):
+        if event.database_name == BENCH_DB_NAME:
+            self.counts[event.command_name] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    def reset(self):
+        self.counts.clear()
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+
+command_counter = CommandCounter()
+
+
+def load_server(mongo_url: str = BENCH_MONGO_URL):
+    """Import server.py against the benchmark database with command counting enabled"""
+    os.environ["MONGO_URL"] = mongo_url
+    os.environ["DB_NAME"] = BENCH_DB_NAME
+    # Must be registered before the Motor client is created
+    monitoring.register(command_counter)
+    import server
+    return server
+
+
+def bench_client(server):
+    """HTTP client that calls the FastAPI app in-process: no network and no startup tasks"""
+    import httpx
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://bench")
+
+
+def auth_headers(server, user):
+    token = server.create_access_token(data={"sub": user.id, "role": user.role})
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def reset_database(server):
+    """Drop the benchmark database and recreate the registered indexes"""
+    await server.client.drop_database(BENCH_DB_NAME)
+    await server.ensure_indexes(server.db)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(samples_ms):
+    """Latency summary in milliseconds"""
+    return {
+        "mean_ms": round(statistics.fmean(samples_ms), 3),
+        "p50_ms": round(percentile(samples_ms, 50), 3),
+        "p95_ms": round(percentile(samples_ms, 95), 3),
+        "p99_ms": round(percentile(samples_ms, 99), 3),
+    }
+
+
+async def time_calls(make_call, iterations):
+    """Await make_call() `iterations` times; returns per-call latencies (ms) and commands per call"""
+    samples = []
+    command_counter.reset()
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await make_call()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples, command_counter.total / iterations
@@ -0,0 +1,188 @@
+"""Latency, throughput and query count for the main list endpoints.
+
+Runs the FastAPI app in-process over httpx's ASGI transport against a
+throwaway database: BENCH_MONGO_URL by default, or a temporary mongod
+started for the run with --ephemeral. That needs the optional pymongo_inmemory
+package, which is not in requirements.txt:
+
+    pip install "pymongo_inmemory>=0.5.0"
+
+Seeds donors, recipients, listings, orders, ratings and messages at the
+requested volumes with datagen (deterministic for a given --seed), then
+sends --requests requests per endpoint, --concurrency at a time, rotating
+through the seeded users.
+
+Results go to stdout and, with --output, to a JSON file; --compare prints
+the change against an earlier results file:
+
+    python -m benchmarks.endpoints --output before.json
+    python -m benchmarks.endpoints --output after.json --compare before.json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import subprocess
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from benchmarks.common import (
+    BENCH_MONGO_URL,
+    auth_headers,
+    bench_client,
+    command_counter,
+    load_server,
+    reset_database,
+    summarize,
+)
+
+ENDPOINTS = {
+    "food_items_recipient": ("recipient", "/api/food-items"),
+    "food_items_donor": ("donor", "/api/food-items"),
+    "orders_recipient": ("recipient", "/api/orders"),
+    "orders_donor": ("donor", "/api/orders"),
+    "chat_contacts": ("donor", "/api/chat/contacts"),
+    "recipient_tracking": ("donor", "/api/donors/recipients"),
+}
+COMPARED_METRICS = ("p50_ms", "p95_ms", "p99_ms", "throughput_rps", "queries_per_request")
+
+
+async def measure(http, headers_by_user, path, requests, concurrency):
+    """Send `requests` GETs, `concurrency` in flight, rotating through the users"""
+    samples, errors = [], 0
+    slots = asyncio.Semaphore(concurrency)
+
+    async def call(index):
+        nonlocal errors
+        async with slots:
+            started = time.perf_counter()
+            response = await http.get(path, headers=headers_by_user[index % len(headers_by_user)])
+            samples.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                errors += 1
+
+    command_counter.reset()
+    started = time.perf_counter()
+    await asyncio.gather(*(call(index) for index in range(requests)))
+    elapsed = time.perf_counter() - started
+    return {
+        **summarize(samples),
+        "throughput_rps": round(requests / elapsed, 1),
+        "queries_per_request": round(command_counter.total / requests, 2),
+        "errors": errors,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_comparison(results, baseline):
+    print(f"\nchange vs {baseline['meta'].get('commit') or 'baseline'}:")
+    for name, metrics in results.items():
+        before = baseline["results"].get(name)
+        if not before:
+            continue
+        changes = []
+        for metric in COMPARED_METRICS:
+            if before.get(metric):
+                changes.append(f"{metric}={(metrics[metric] - before[metric]) / before[metric] * 100:+.1f}%")
+        print(f"{name:<22} " + "  ".join(changes))
+
+
+@contextlib.contextmanager
+def mongo_url(ephemeral):
+    if not ephemeral:
+        yield BENCH_MONGO_URL
+        return
+    try:
+        from pymongo_inmemory import MongoClient
+    except ImportError:
+        raise SystemExit('--ephemeral needs the pymongo_inmemory package (pip install "pymongo_inmemory>=0.5.0")')
+    # The client starts a temporary mongod and stops it when the block exits
+    with MongoClient() as inmemory:
+        host, port = inmemory.address
+        yield f"mongodb://{host}:{port}"
+
+
+async def run(server, args):
+    # Imported here: datagen imports server, which must be loaded against the benchmark database first
+    import datagen
+
+    await reset_database(server)
+    volumes = datagen.Volumes(
+        donors=args.donors,
+        recipients=args.recipients,
+        items_per_donor=args.items_per_donor,
+        order_rate=args.order_rate,
+        messages_per_order=args.messages_per_order,
+        seed=args.seed,
+    )
+    await datagen.seed_database(server.db, volumes)
+    headers = {
+        role: [
+            auth_headers(server, SimpleNamespace(id=datagen.user_id(args.seed, role, index), role=role))
+            for index in range(count)
+        ]
+        for role, count in (("donor", args.donors), ("recipient", args.recipients))
+    }
+
+    results = {}
+    async with bench_client(server) as http:
+        for name, (role, path) in ENDPOINTS.items():
+            if args.endpoints and name not in args.endpoints:
+                continue
+            await measure(http, headers[role], path, min(args.requests, 20), args.concurrency)  # warm up
+            results[name] = await measure(http, headers[role], path, args.requests, args.concurrency)
+            stats = results[name]
+            print(
+                f"{name:<22} p50={stats['p50_ms']:.2f}ms p95={stats['p95_ms']:.2f}ms p99={stats['p99_ms']:.2f}ms "
+                f"rps={stats['throughput_rps']:.1f} queries/req={stats['queries_per_request']:.2f} errors={stats['errors']}"
+            )
+    await server.client.drop_database(server.db.name)
+    return results
+
+
+def main(args):
+    with mongo_url(args.ephemeral) as url:
+        server = load_server(url)
+        try:
+            results = asyncio.run(run(server, args))
+        finally:
+            server.client.close()
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "parameters": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+    if args.compare:
+        with open(args.compare) as baseline:
+            print_comparison(results, json.load(baseline))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--donors", type=int, default=50)
+    parser.add_argument("--recipients", type=int, default=500)
+    parser.add_argument("--items-per-donor", type=int, default=100)
+    parser.add_argument("--order-rate", type=float, default=0.6)
+    parser.add_argument("--messages-per-order", type=int, default=3)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--endpoints", nargs="+", choices=sorted(ENDPOINTS), help="Only run these endpoints")
+    parser.add_argument("--ephemeral", action="store_true", help="Start a temporary mongod instead of using BENCH_MONGO_URL")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", help="Earlier JSON results to compare against")
+    main(parser.parse_args())
@@ -0,0 +1,73 @@
+"""Latency of an unrelated endpoint while a burst of logins verifies passwords.
+
+Compares bcrypt run inline on the event loop (the old behaviour) with the
+offloaded, bounded pool used by verify_password. No MongoDB is needed: the
+burst calls the password verification step of /auth/login directly and the
+probe calls the /health handler.
+
+    python -m benchmarks.login_burst --logins 50 --rounds 12
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from benchmarks.common import summarize
+
+PROBE_INTERVAL_SECONDS = 0.005
+
+
+async def probe(server, stop, samples):
+    """Call /health every few milliseconds and record how long each call really took"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL_SECONDS)
+        await server.health_check()
+        samples.append((time.perf_counter() - started - PROBE_INTERVAL_SECONDS) * 1000)
+
+
+async def inline_login(server, hashed):
+    server.pwd_context.verify("password123", hashed)
+
+
+async def offloaded_login(server, hashed):
+    await server.verify_password("password123", hashed)
+
+
+async def run_burst(server, login, logins, hashed):
+    stop = asyncio.Event()
+    samples = []
+    prober = asyncio.create_task(probe(server, stop, samples))
+    await asyncio.sleep(0.05)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(login(server, hashed) for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await prober
+    return summarize(samples), elapsed
+
+
+async def main(logins, rounds):
+    os.environ["BCRYPT_ROUNDS"] = str(rounds)
+    from benchmarks.common import load_server
+    server = load_server()
+    hashed = server.pwd_context.hash("password123")
+
+    for name, login in (("inline", inline_login), ("offloaded", offloaded_login)):
+        stats, elapsed = await run_burst(server, login, logins, hashed)
+        print(
+            f"{name:<10} logins={logins} rounds={rounds} burst={elapsed:.2f}s "
+            f"/health p50={stats['p50_ms']:.2f}ms p99={stats['p99_ms']:.2f}ms"
+        )
+
+    server.password_hash_executor.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=12)
+    args = parser.parse_args()
+    asyncio.run(main(args.logins, args.rounds))
@@ -0,0 +1,86 @@
+"""Per-item cost of building and serializing response models from stored documents.
+
+For each model, compares:
+
+* validate  - Model(**document), the old per-item read path
+* validated response - validate each item, then what FastAPI does with a
+  response_model (dump, validate again, serialize)
+* adapter response - validate and serialize the whole list in one
+  TypeAdapter pass (validated_json)
+
+No MongoDB is needed: documents are generated in the shape they are stored.
+
+    python -m benchmarks.models --items 1000
+"""
+import argparse
+import time
+from datetime import datetime, timezone
+from typing import List
+from uuid import uuid4
+
+from benchmarks.common import load_server
+from benchmarks.serialization import food_items, orders, ratings
+
+
+def messages(server, count):
+    return [
+        server.Message(
+            sender_id=str(uuid4()),
+            receiver_id=str(uuid4()),
+            content=f"Is the pickup still at 6pm? ({i})",
+            timestamp=datetime.now(timezone.utc),
+        )
+        for i in range(count)
+    ]
+
+
+def per_item_us(run, items, repeat):
+    """Best of `repeat` runs, in microseconds per item"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best / items * 1_000_000
+
+
+def main(items, repeat):
+    server = load_server()
+    builders = (
+        (server.FoodItem, food_items),
+        (server.FoodItemWithRating, food_items),
+        (server.OrderWithDetails, orders),
+        (server.Message, messages),
+        (server.Rating, ratings),
+    )
+
+    for model, build in builders:
+        # Stored documents carry Mongo's _id and other undeclared keys
+        documents = [
+            {"_id": i, **item.model_dump()}
+            for i, item in enumerate(build(server, items))
+        ]
+        adapter = server.json_adapter(List[model])
+
+        def validated_response():
+            models = [model(**document) for document in documents]
+            adapter.dump_json(adapter.validate_python([item.model_dump() for item in models]))
+
+        def adapter_response():
+            adapter.dump_json(adapter.validate_python(documents))
+
+        results = {
+            "validate": per_item_us(lambda: [model(**document) for document in documents], items, repeat),
+            "validated response": per_item_us(validated_response, items, repeat),
+            "adapter response": per_item_us(adapter_response, items, repeat),
+        }
+        print(f"{model.__name__:<19} " + "  ".join(f"{name}={cost:.2f}us" for name, cost in results.items()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args.items, args.repeat)
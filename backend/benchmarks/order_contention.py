@@ -0,0 +1,95 @@
+"""Many recipients claiming the same food item at the same moment.
+
+Runs the old read-check-write claim and the state machine claim against a
+fresh item each round, and reports how many claims won (must be exactly one)
+and MongoDB commands per claim attempt.
+
+    python -m benchmarks.order_contention --claimants 50 --rounds 20
+"""
+import argparse
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException
+
+from benchmarks.common import command_counter, load_server, reset_database
+
+server = load_server()
+
+
+async def legacy_claim(food_item_id, recipient_id):
+    """The pre-state-machine create_order: read, check, insert, update"""
+    food_item = await server.db.food_items.find_one({"id": food_item_id})
+    if not food_item or food_item["status"] != "available":
+        raise HTTPException(status_code=400, detail="Food item is not available")
+    order = server.Order(food_item_id=food_item_id, recipient_id=recipient_id, donor_id=food_item["donor_id"])
+    await server.db.orders.insert_one(server.prepare_for_mongo(order.dict()))
+    await server.db.food_items.update_one(
+        {"id": food_item_id}, {"$set": {"status": "claimed", "updated_at": datetime.now(timezone.utc)}}
+    )
+
+
+async def state_machine_claim(food_item_id, recipient_id):
+    await server.create_order(
+        server.OrderCreate(food_item_id=food_item_id),
+        current_user=server.AuthenticatedUser(id=recipient_id, role="recipient")
+    )
+
+
+async def new_item(donor_id):
+    item = server.FoodItem(
+        title="Contended meal",
+        quantity="1 box",
+        expiry_time=datetime.now(timezone.utc) + timedelta(hours=2),
+        pickup_address="1 Bench Street",
+        latitude=12.97,
+        longitude=77.59,
+        donor_id=donor_id,
+    )
+    data = server.prepare_for_mongo(item.dict())
+    data["location"] = server.geo_point(item.latitude, item.longitude)
+    await server.db.food_items.insert_one(data)
+    return item.id
+
+
+async def run(name, claim, claimants, rounds):
+    donor_id = str(uuid.uuid4())
+    recipients = [str(uuid.uuid4()) for _ in range(claimants)]
+    winners_per_round = []
+    commands = 0
+
+    for _ in range(rounds):
+        food_item_id = await new_item(donor_id)
+        command_counter.reset()
+        results = await asyncio.gather(
+            *(claim(food_item_id, recipient_id) for recipient_id in recipients),
+            return_exceptions=True
+        )
+        commands += command_counter.total
+        unexpected = [r for r in results if isinstance(r, Exception) and not isinstance(r, HTTPException)]
+        if unexpected:
+            raise unexpected[0]
+        winners_per_round.append(sum(1 for r in results if not isinstance(r, Exception)))
+
+    exact = sum(1 for winners in winners_per_round if winners == 1)
+    print(
+        f"{name:<14} claimants={claimants} rounds={rounds} "
+        f"rounds_with_exactly_one_winner={exact}/{rounds} max_winners={max(winners_per_round)} "
+        f"commands/claim={commands / (claimants * rounds):.2f}"
+    )
+
+
+async def main(claimants, rounds):
+    await reset_database(server)
+    await run("legacy", legacy_claim, claimants, rounds)
+    await run("state-machine", state_machine_claim, claimants, rounds)
+    server.client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--claimants", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.claimants, args.rounds))
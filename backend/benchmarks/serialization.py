@@ -0,0 +1,127 @@
+"""Serialization time and bytes on the wire for large list responses.
+
+Compares the old response path (jsonable_encoder + stdlib json) with the
+current one (response_model serialization + orjson), then reports the
+body size raw, gzipped and brotli-compressed (when the brotli package is
+installed) at the levels the CompressionMiddleware uses. No MongoDB is
+needed: the responses are built from generated models.
+
+    python -m benchmarks.serialization --sizes 50 500 5000
+"""
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List
+from uuid import uuid4
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import TypeAdapter
+
+from benchmarks.common import load_server, summarize
+from compression import CompressionMiddleware, brotli
+
+
+def food_items(server, count):
+    now = datetime.now(timezone.utc)
+    return [
+        server.FoodItemWithRating(
+            title=f"Surplus meal {i}",
+            description="Vegetable curry and rice, packed in trays",
+            quantity=f"{i % 40 + 1} plates",
+            expiry_time=now + timedelta(hours=i % 48),
+            pickup_address=f"{i} Market Street",
+            latitude=12.97 + i / 10000,
+            longitude=77.59 + i / 10000,
+            donor_id=str(uuid4()),
+            donor_name="Green Kitchen",
+            donor_organization="Green Kitchen Co-op",
+            donor_average_rating=4.5,
+            donor_total_ratings=i % 100,
+        )
+        for i in range(count)
+    ]
+
+
+def orders(server, count):
+    now = datetime.now(timezone.utc)
+    return [
+        server.OrderWithDetails(
+            id=str(uuid4()),
+            food_item_id=str(uuid4()),
+            recipient_id=str(uuid4()),
+            donor_id=str(uuid4()),
+            order_type="purchase" if i % 3 else "claim",
+            total_amount=(i % 20) * 2.5,
+            payment_status="completed",
+            delivery_method="pickup",
+            delivery_address=None,
+            status="completed",
+            created_at=now - timedelta(minutes=i),
+            updated_at=now,
+            food_title=f"Surplus meal {i}",
+            food_quantity="10 plates",
+            pickup_address=f"{i} Market Street",
+            donor_name="Green Kitchen",
+            donor_organization="Green Kitchen Co-op",
+        )
+        for i in range(count)
+    ]
+
+
+def ratings(server, count):
+    return [
+        server.Rating(
+            order_id=str(uuid4()),
+            donor_id=str(uuid4()),
+            recipient_id=str(uuid4()),
+            rating=i % 5 + 1,
+            feedback="Fresh and well packed, pickup was quick",
+            food_title=f"Surplus meal {i}",
+            recipient_name="Community Shelter",
+        )
+        for i in range(count)
+    ]
+
+
+def time_render(render, iterations):
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        body = render()
+        samples.append((time.perf_counter() - started) * 1000)
+    return summarize(samples), body
+
+
+def main(sizes, iterations):
+    server = load_server()
+    middleware = CompressionMiddleware(None)
+    builders = (
+        ("FoodItemWithRating", server.FoodItemWithRating, food_items),
+        ("OrderWithDetails", server.OrderWithDetails, orders),
+        ("Rating", server.Rating, ratings),
+    )
+
+    for name, model, build in builders:
+        adapter = TypeAdapter(List[model])
+        for size in sizes:
+            models = build(server, size)
+            before, _ = time_render(lambda: JSONResponse(jsonable_encoder(models)).body, iterations)
+            after, body = time_render(lambda: ORJSONResponse(adapter.dump_python(models, mode="json")).body, iterations)
+
+            gzipped = len(middleware.compress(body, "gzip"))
+            compressed = f"gzip={gzipped}B"
+            if brotli is not None:
+                compressed += f" br={len(middleware.compress(body, 'br'))}B"
+            print(
+                f"{name:<19} n={size:<5} jsonable+json p50={before['p50_ms']:.2f}ms "
+                f"model+orjson p50={after['p50_ms']:.2f}ms raw={len(body)}B {compressed}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 500, 5000])
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+    main(args.sizes, args.iterations)
@@ -0,0 +1,254 @@
+"""Deterministic synthetic data for load testing.
+
+Generates users, food items, orders, ratings and messages that follow the
+app's rules. Each food item belongs to a donor. An item with a live order
+is claimed (donation) or sold (sale); otherwise it is available or
+expired, depending on its expiry time. Cancelled orders never hold an item.
+Claims are paid up front, and only paid purchases are confirmed or
+completed. Only completed orders are rated, once each. Messages are
+between the two sides of an order. Users and items are clustered around a
+few city centres, so nearby search has realistic density.
+
+Documents are built through the API models and prepare_for_mongo, so they
+have exactly the shape the API writes. Each work unit draws from its own
+generator seeded by (seed, unit), and user ids are derived from
+(seed, role, index). The same seed and volumes therefore give the same
+documents however the inserts are interleaved; only timestamps move with
+the time of the run. Every seeded user's password is SEED_PASSWORD.
+"""
+import asyncio
+import hashlib
+import math
+import random
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from server import FoodItem, Message, Order, Rating, User, geo_point, prepare_for_mongo, pwd_context
+
+SEED_PASSWORD = "password123"
+
+# (latitude, longitude) of the cities users are clustered around
+CITY_CENTRES = [
+    (12.9716, 77.5946),
+    (19.0760, 72.8777),
+    (28.6139, 77.2090),
+    (13.0827, 80.2707),
+    (22.5726, 88.3639),
+    (17.3850, 78.4867),
+]
+CLUSTER_SPREAD_KM = 8
+
+ORDER_STATUSES = {
+    # status -> weight; claims are never "confirmed" (that is the paid state of a purchase)
+    "claim": {"pending": 20, "completed": 65, "cancelled": 15},
+    "purchase": {"pending": 15, "confirmed": 15, "completed": 55, "cancelled": 15},
+}
+FOOD_TITLES = ["Vegetable biryani", "Bread loaves", "Fruit crates", "Dal and rice", "Sandwich trays", "Pastries", "Salad boxes"]
+FEEDBACK = ["Fresh and well packed", "Pickup was quick", "Generous portions", "Slightly late but good", None]
+
+
+@dataclass
+class Volumes:
+    donors: int = 1000
+    recipients: int = 10000
+    items_per_donor: int = 100
+    order_rate: float = 0.6  # share of items that get an order
+    rating_rate: float = 0.5  # share of completed orders that are rated
+    messages_per_order: int = 3  # average
+    seed: int = 1
+
+
+def stable_id(*parts) -> str:
+    """uuid4-shaped id derived from its parts"""
+    digest = hashlib.md5(":".join(map(str, parts)).encode()).digest()
+    return str(uuid.UUID(bytes=digest, version=4))
+
+
+def user_id(seed: int, role: str, index: int) -> str:
+    return stable_id(seed, role, index)
+
+
+def clustered_point(rng: random.Random):
+    latitude, longitude = rng.choice(CITY_CENTRES)
+    latitude += rng.gauss(0, CLUSTER_SPREAD_KM / 111)
+    longitude += rng.gauss(0, CLUSTER_SPREAD_KM / (111 * math.cos(math.radians(latitude))))
+    return round(latitude, 6), round(longitude, 6)
+
+
+def weighted_choice(rng: random.Random, weights: dict):
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+class Generator:
+    def __init__(self, volumes: Volumes, now: datetime, hashed_password: str):
+        self.volumes = volumes
+        self.now = now
+        self.hashed_password = hashed_password
+
+    def user(self, rng, role, index):
+        latitude, longitude = clustered_point(rng)
+        user = User(
+            id=user_id(self.volumes.seed, role, index),
+            email=f"{role}{index}@seed.example.com",
+            username=f"{role}{index}",
+            full_name=f"Seed {role.title()} {index}",
+            role=role,
+            phone=f"555-{index % 10000:04d}",
+            address=f"{index} Seed Street",
+            latitude=latitude,
+            longitude=longitude,
+            organization_name=f"Seed Organization {index}",
+            created_at=self.now - timedelta(days=rng.randint(30, 720)),
+        )
+        document = prepare_for_mongo(user.dict())
+        document["hashed_password"] = self.hashed_password
+        return document
+
+    def recipients(self, unit, first, last):
+        rng = random.Random(f"{self.volumes.seed}:recipients:{unit}")
+        return {"users": [self.user(rng, "recipient", index) for index in range(first, last)]}
+
+    def donors(self, unit, first, last):
+        """Donor users plus everything that hangs off their listings"""
+        rng = random.Random(f"{self.volumes.seed}:donors:{unit}")
+        documents = {"users": [], "food_items": [], "orders": [], "ratings": [], "messages": []}
+        for index in range(first, last):
+            donor = self.user(rng, "donor", index)
+            documents["users"].append(donor)
+            for _ in range(self.volumes.items_per_donor):
+                self.listing(rng, donor, documents)
+        return documents
+
+    def listing(self, rng, donor, documents):
+        food_type = "sale" if rng.random() < 0.3 else "donation"
+        created_at = self.now - timedelta(minutes=rng.randint(10, 60 * 24 * 60))
+        expiry_time = created_at + timedelta(hours=rng.randint(2, 96))
+        item = FoodItem(
+            id=stable_id(rng.getrandbits(64)),
+            title=rng.choice(FOOD_TITLES),
+            description="Surplus from today's service",
+            quantity=f"{rng.randint(1, 60)} {rng.choice(['plates', 'kg', 'boxes'])}",
+            expiry_time=expiry_time,
+            pickup_address=donor["address"],
+            latitude=round(donor["latitude"] + rng.gauss(0, 0.002), 6),
+            longitude=round(donor["longitude"] + rng.gauss(0, 0.002), 6),
+            donor_id=donor["id"],
+            food_type=food_type,
+            price=round(rng.uniform(1, 25), 2) if food_type == "sale" else None,
+            delivery_available=food_type == "sale" and rng.random() < 0.3,
+            status="available" if expiry_time > self.now else "expired",
+            created_at=created_at,
+            updated_at=created_at,
+        )
+
+        if rng.random() < self.volumes.order_rate:
+            order = self.order(rng, item)
+            documents["orders"].append(prepare_for_mongo(order.dict()))
+            if order.status != "cancelled":
+                item.status = "claimed" if food_type == "donation" else "sold"
+                item.updated_at = order.created_at
+            if order.status == "completed" and rng.random() < self.volumes.rating_rate:
+                documents["ratings"].append(prepare_for_mongo(self.rating(rng, order).dict()))
+            documents["messages"].extend(
+                prepare_for_mongo(message.dict()) for message in self.messages(rng, order)
+            )
+
+        food_document = prepare_for_mongo(item.dict())
+        food_document["location"] = geo_point(item.latitude, item.longitude)
+        documents["food_items"].append(food_document)
+
+    def order(self, rng, item):
+        order_type = "claim" if item.food_type == "donation" else "purchase"
+        status = weighted_choice(rng, ORDER_STATUSES[order_type])
+        # Claims are paid on creation; a purchase is paid once confirmed, and paid purchases cannot be cancelled
+        paid = order_type == "claim" or status in ("confirmed", "completed")
+        # Ordered while the item was still on offer
+        window = (min(self.now, item.expiry_time) - item.created_at) // timedelta(minutes=1)
+        created_at = item.created_at + timedelta(minutes=rng.randint(1, max(1, min(240, window))))
+        return Order(
+            id=stable_id(rng.getrandbits(64)),
+            food_item_id=item.id,
+            recipient_id=user_id(self.volumes.seed, "recipient", rng.randrange(self.volumes.recipients)),
+            donor_id=item.donor_id,
+            order_type=order_type,
+            total_amount=item.price or 0.0,
+            payment_status="completed" if paid else "pending",
+            status=status,
+            food_title=item.title,
+            food_quantity=item.quantity,
+            pickup_address=item.pickup_address,
+            created_at=created_at,
+            updated_at=min(self.now, created_at + timedelta(minutes=rng.randint(0, 600))),
+        )
+
+    def rating(self, rng, order):
+        created_at = min(self.now, order.updated_at + timedelta(hours=rng.randint(1, 48)))
+        return Rating(
+            id=stable_id(rng.getrandbits(64)),
+            order_id=order.id,
+            donor_id=order.donor_id,
+            recipient_id=order.recipient_id,
+            rating=rng.choices([1, 2, 3, 4, 5], weights=[2, 3, 10, 35, 50])[0],
+            feedback=rng.choice(FEEDBACK),
+            food_title=order.food_title,
+            created_at=created_at,
+            updated_at=created_at,
+        )
+
+    def messages(self, rng, order):
+        count = rng.randint(0, 2 * self.volumes.messages_per_order)
+        for offset in range(count):
+            sender, receiver = rng.choice([(order.donor_id, order.recipient_id), (order.recipient_id, order.donor_id)])
+            timestamp = min(self.now, order.created_at + timedelta(minutes=5 * offset + rng.randint(0, 4)))
+            yield Message(
+                id=stable_id(rng.getrandbits(64)),
+                sender_id=sender,
+                receiver_id=receiver,
+                content=f"About {order.food_title}: message {offset + 1}",
+                timestamp=timestamp,
+                # Older messages have been read
+                is_read=self.now - timestamp > timedelta(hours=1) or rng.random() < 0.5,
+            )
+
+
+def work_units(volumes: Volumes, batch_size: int):
+    """(kind, unit, first index, last index) slices sized to roughly one insert batch each"""
+    donors_per_unit = max(1, batch_size // max(1, volumes.items_per_donor))
+    for unit, first in enumerate(range(0, volumes.donors, donors_per_unit)):
+        yield "donors", unit, first, min(volumes.donors, first + donors_per_unit)
+    for unit, first in enumerate(range(0, volumes.recipients, batch_size)):
+        yield "recipients", unit, first, min(volumes.recipients, first + batch_size)
+
+
+async def seed_database(db, volumes: Volumes, batch_size: int = 5000, concurrency: int = 4, progress=None):
+    """Generate and insert the data set with up to `concurrency` insert_many batches in flight.
+
+    Returns the number of documents inserted per collection. progress(counts)
+    is called after each work unit is queued.
+    """
+    generator = Generator(volumes, datetime.now(timezone.utc), pwd_context.hash(SEED_PASSWORD))
+    slots = asyncio.Semaphore(concurrency)
+    inserts = []
+    counts = Counter()
+
+    async def insert(collection, documents):
+        try:
+            await db[collection].insert_many(documents, ordered=False)
+            counts[collection] += len(documents)
+        finally:
+            slots.release()
+
+    for kind, unit, first, last in work_units(volumes, batch_size):
+        # Generation runs on the loop while earlier batches are written by Motor's threads
+        generated = getattr(generator, kind)(unit, first, last)
+        for collection, documents in generated.items():
+            for start in range(0, len(documents), batch_size):
+                await slots.acquire()
+                inserts.append(asyncio.create_task(insert(collection, documents[start:start + batch_size])))
+        if progress:
+            progress(counts)
+
+    await asyncio.gather(*inserts)
+    return counts
@@ -0,0 +1,123 @@
+"""Index registry for the SaverFwd MongoDB collections.
+
+Every query shape used by server.py should be served by one of the indexes
+declared here. ensure_indexes() is called from the startup hook; creating an
+index that already exists with the same name and options is a no-op, so it is
+safe to run on every boot.
+"""
+import asyncio
+import logging
+import time
+
+from pymongo import ASCENDING, DESCENDING, GEOSPHERE, IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_POLL_SECONDS = 5
+
+INDEXES = {
+    "users": [
+        # get_current_user and every profile/$in lookup
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # Registration and login
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("username", ASCENDING)], name="username_unique", unique=True),
+    ],
+    "food_items": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # Donor listing and active-listing counts
+        IndexModel([("donor_id", ASCENDING), ("status", ASCENDING)], name="donor_status"),
+        # Keyset-paged listings, newest first
+        IndexModel([("donor_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="donor_created_id"),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="status_created_id"),
+        # Recipient browse, the expiry job and its next-due lookup
+        IndexModel([("status", ASCENDING), ("expiry_time", ASCENDING)], name="status_expiry"),
+        IndexModel([("status", ASCENDING), ("food_type", ASCENDING), ("expiry_time", ASCENDING)], name="status_type_expiry"),
+        # Nearby search
+        IndexModel([("location", GEOSPHERE)], name="location_2dsphere"),
+    ],
+    "orders": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # Keyset-paged order history, newest first
+        IndexModel([("recipient_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="recipient_created_id"),
+        IndexModel([("donor_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="donor_created_id"),
+        # Chat permission checks
+        IndexModel([("donor_id", ASCENDING), ("recipient_id", ASCENDING), ("status", ASCENDING)], name="donor_recipient_status"),
+        # Per-recipient tracking, paged newest first
+        IndexModel([("donor_id", ASCENDING), ("recipient_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="donor_recipient_created_id"),
+        # Dashboard counters
+        IndexModel([("donor_id", ASCENDING), ("order_type", ASCENDING), ("status", ASCENDING)], name="donor_type_status"),
+        IndexModel([("recipient_id", ASCENDING), ("order_type", ASCENDING), ("status", ASCENDING)], name="recipient_type_status"),
+    ],
+    "ratings": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # One rating per order
+        IndexModel([("order_id", ASCENDING)], name="order_id_unique", unique=True),
+        IndexModel([("donor_id", ASCENDING), ("created_at", DESCENDING)], name="donor_created"),
+        IndexModel([("recipient_id", ASCENDING), ("created_at", DESCENDING)], name="recipient_created"),
+    ],
+    "donor_rating_stats": [
+        IndexModel([("donor_id", ASCENDING)], name="donor_id_unique", unique=True),
+    ],
+    "user_stats": [
+        IndexModel([("user_id", ASCENDING)], name="user_id_unique", unique=True),
+    ],
+    "messages": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # Each side of the $or in conversation and last-message queries
+        IndexModel([("sender_id", ASCENDING), ("receiver_id", ASCENDING), ("timestamp", DESCENDING), ("id", DESCENDING)], name="sender_receiver_time_id"),
+        # Unread counters
+        IndexModel([("receiver_id", ASCENDING), ("is_read", ASCENDING), ("sender_id", ASCENDING)], name="receiver_unread_sender"),
+    ],
+    "job_leases": [
+        # Leases are looked up by _id; this only removes leases of jobs nothing runs any more
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=3600),
+    ],
+}
+
+
+async def _report_index_build_progress(db):
+    """Periodically log the progress of index builds running on this database"""
+    while True:
+        await asyncio.sleep(PROGRESS_POLL_SECONDS)
+        try:
+            current = await db.client.admin.command({
+                "currentOp": 1,
+                "command.createIndexes": {"$exists": True},
+                "ns": {"$regex": f"^{db.name}\\."}
+            })
+        except OperationFailure:
+            # Not permitted to inspect operations; the per-collection log lines still show progress
+            return
+        for op in current.get("inprog", []):
+            progress = op.get("progress") or {}
+            if progress.get("total"):
+                logger.info(
+                    "Index build on %s: %s (%d/%d)",
+                    op.get("ns"), op.get("msg", "in progress"), progress.get("done", 0), progress["total"]
+                )
+
+
+async def ensure_indexes(db):
+    """Create every registered index that does not exist yet, logging progress per collection"""
+    reporter = asyncio.create_task(_report_index_build_progress(db))
+    failed = []
+    try:
+        total = len(INDEXES)
+        for position, (collection_name, indexes) in enumerate(INDEXES.items(), start=1):
+            started = time.monotonic()
+            logger.info("Ensuring %d indexes on %s (%d/%d)", len(indexes), collection_name, position, total)
+            try:
+                await db[collection_name].create_indexes(indexes)
+            except OperationFailure as e:
+                # Typically duplicate data under a unique index or a conflicting existing index;
+                # keep serving and surface it rather than failing startup
+                failed.append(collection_name)
+                logger.error("Could not create indexes on %s: %s", collection_name, e)
+                continue
+            logger.info("Indexes ready on %s in %.2fs", collection_name, time.monotonic() - started)
+    finally:
+        reporter.cancel()
+
+    return failed
@@ -0,0 +1,139 @@
+"""Mongo-backed leases that keep singleton background jobs on one instance.
+
+Every worker process on every node starts the same background jobs, but a
+job only runs where its lease is held. A lease is one document in
+`job_leases` ({_id: job name, owner, expires_at}). The holder renews it every
+ttl/3 seconds and stops the job if it cannot renew before the lease runs out;
+standbys try to take it every ttl/3 seconds. A holder that dies is replaced
+within about ttl + ttl/3 seconds, and one that shuts down cleanly releases
+the lease so a standby takes over on its next attempt.
+
+Expiry is compared against the database clock ($$NOW), so clock skew between
+hosts does not matter. The TTL index on expires_at only cleans up leases of
+jobs that no instance runs any more.
+"""
+import asyncio
+import logging
+import os
+import socket
+import uuid
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+
+def instance_id() -> str:
+    """Owner name for this process's leases"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class Lease:
+    def __init__(self, collection, name: str, owner: str, ttl_seconds: float):
+        self.collection = collection
+        self.name = name
+        self.owner = owner
+        self.ttl_seconds = ttl_seconds
+
+    async def acquire(self) -> bool:
+        """Take or renew the lease; False while another owner holds a live one"""
+        # The query matches the lease by _id only (an upsert cannot use $expr); whether it
+        # may be taken is decided inside the update, atomically, against the database clock
+        mine = {"$eq": ["$owner", self.owner]}
+        takeover = {"$or": [mine, {"$lte": [{"$ifNull": ["$expires_at", None]}, "$$NOW"]}]}
+        try:
+            lease = await self.collection.find_one_and_update(
+                {"_id": self.name},
+                [
+                    {"$set": {"_take": takeover}},
+                    {"$set": {
+                        "owner": {"$cond": ["$_take", self.owner, "$owner"]},
+                        "acquired_at": {"$cond": [{"$and": ["$_take", {"$not": [mine]}]}, "$$NOW", "$acquired_at"]},
+                        "renewed_at": {"$cond": ["$_take", "$$NOW", "$renewed_at"]},
+                        "expires_at": {"$cond": [
+                            "$_take", {"$add": ["$$NOW", int(self.ttl_seconds * 1000)]}, "$expires_at"
+                        ]},
+                    }},
+                    {"$unset": "_take"},
+                ],
+                projection={"owner": 1},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            # Lost the race to create the lease document
+            return False
+        return lease["owner"] == self.owner
+
+    async def release(self):
+        await self.collection.delete_one({"_id": self.name, "owner": self.owner})
+
+
+class LeasedJob:
+    """Runs job() on whichever instance holds the lease called `name`"""
+
+    def __init__(self, db, name: str, job, ttl_seconds: float = 15, owner: str = None):
+        self.name = name
+        self.job = job
+        self.lease = Lease(db.job_leases, name, owner or instance_id(), ttl_seconds)
+        self.interval = ttl_seconds / 3
+        self.is_leader = False
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the job, waiting for it to finish cancelling, and release the lease"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                acquired = await self.lease.acquire()
+            except Exception:
+                logger.exception("Could not reach job_leases for %s", self.name)
+                acquired = False
+            if acquired:
+                await self._lead()
+            await asyncio.sleep(self.interval)
+
+    async def _lead(self):
+        loop = asyncio.get_running_loop()
+        renewed_at = loop.time()
+        self.is_leader = True
+        logger.info("Took the %s lease as %s; running the job here", self.name, self.lease.owner)
+        job = asyncio.create_task(self.job())
+        try:
+            while True:
+                done, _ = await asyncio.wait({job}, timeout=self.interval)
+                if done:
+                    if not job.cancelled() and job.exception():
+                        logger.error("Job %s failed", self.name, exc_info=job.exception())
+                    return
+                try:
+                    if not await self.lease.acquire():
+                        logger.warning("Lost the %s lease to another instance", self.name)
+                        return
+                    renewed_at = loop.time()
+                except Exception:
+                    # Stop before the lease can run out while the job is still running here
+                    if loop.time() - renewed_at + self.interval >= self.lease.ttl_seconds:
+                        logger.exception("Could not renew the %s lease; stopping the job", self.name)
+                        return
+                    logger.warning("Could not renew the %s lease; retrying", self.name, exc_info=True)
+        finally:
+            self.is_leader = False
+            job.cancel()
+            await asyncio.gather(job, return_exceptions=True)
+            try:
+                await self.lease.release()
+            except Exception:
+                logger.warning("Could not release the %s lease; it expires on its own", self.name, exc_info=True)
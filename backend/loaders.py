@@ -0,0 +1,84 @@
+"""Request-scoped batching loaders.
+
+`loader.load(key)` returns a future. Every key requested during the same
+event-loop tick (for example from a list comprehension, `load_many`, or
+several coroutines gathered together) is fetched with one `$in` query when
+the loop next runs its callbacks. Repeated keys share one future, so each id
+is fetched at most once per loader. Loaders live for one request (see the
+`get_loaders` dependency in server.py), so nothing is cached across requests.
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, List
+
+# The profile fields responses show next to orders, listings, ratings and chats
+USER_PROJECTION = {"_id": 0, "id": 1, "full_name": 1, "organization_name": 1, "phone": 1, "address": 1, "role": 1}
+
+
+class BatchLoader:
+    def __init__(self, batch_fn: Callable[[List[Hashable]], Awaitable[Dict]], max_batch_size: int = 1000):
+        """batch_fn(keys) returns {key: value}; keys it leaves out load as None"""
+        self._batch_fn = batch_fn
+        self._max_batch_size = max_batch_size
+        self._futures: Dict[Hashable, asyncio.Future] = {}
+        self._pending: List[Hashable] = []
+
+    def load(self, key) -> asyncio.Future:
+        future = self._futures.get(key)
+        if future is not None:
+            return future
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._futures[key] = future
+        if not self._pending:
+            # Everything else requested before the loop gets back to its callbacks joins this batch
+            loop.call_soon(self._dispatch)
+        self._pending.append(key)
+        return future
+
+    async def load_many(self, keys) -> list:
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    def prime(self, key, value):
+        """Seed a value the caller already has, so it is not fetched again"""
+        if key not in self._futures:
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(value)
+            self._futures[key] = future
+
+    def _dispatch(self):
+        keys, self._pending = self._pending, []
+        for start in range(0, len(keys), self._max_batch_size):
+            asyncio.ensure_future(self._load_batch(keys[start:start + self._max_batch_size]))
+
+    async def _load_batch(self, keys):
+        try:
+            values = await self._batch_fn(keys)
+        except Exception as error:
+            for key in keys:
+                # Forget failed keys so a later load can retry them
+                future = self._futures.pop(key)
+                if not future.done():
+                    future.set_exception(error)
+            return
+        for key in keys:
+            future = self._futures[key]
+            if not future.done():
+                future.set_result(values.get(key))
+
+
+def documents_by(collection, field: str, projection: dict):
+    """batch_fn fetching documents of `collection` whose `field` is one of the keys"""
+    async def fetch(keys):
+        documents = await collection.find({field: {"$in": keys}}, projection).to_list(length=None)
+        return {document[field]: document for document in documents}
+    return fetch
+
+
+class Loaders:
+    """The loaders one request shares"""
+
+    def __init__(self, db):
+        self.users = BatchLoader(documents_by(db.users, "id", USER_PROJECTION))
+        self.food_items = BatchLoader(documents_by(db.food_items, "id", {"_id": 0}))
+        self.donor_rating_stats = BatchLoader(documents_by(db.donor_rating_stats, "donor_id", {"_id": 0}))
@@ -0,0 +1,137 @@
+"""Maintenance commands for the SaverFwd backend.
+
+Run from the backend directory with the same .env as the API server, e.g.::
+
+    python manage.py rebuild-rating-stats
+"""
+import asyncio
+import time
+
+import typer
+
+from datagen import SEED_PASSWORD, Volumes, seed_database
+from migrations import migrate_iso_strings_to_dates
+from server import (
+    backfill_food_item_locations,
+    backfill_order_food_snapshots,
+    client,
+    db,
+    ensure_indexes,
+    rebuild_donor_rating_stats,
+    user_stats,
+)
+
+cli = typer.Typer(help="SaverFwd backend maintenance commands")
+
+
+def run(coro):
+    """Run a coroutine against the shared Motor client and close it afterwards"""
+    try:
+        return asyncio.run(coro)
+    finally:
+        client.close()
+
+
+@cli.command("rebuild-rating-stats")
+def rebuild_rating_stats():
+    """Recompute the per-donor rating aggregates from the ratings collection"""
+    donors = run(rebuild_donor_rating_stats())
+    typer.echo(f"Rebuilt rating stats for {donors} donors")
+
+
+@cli.command("backfill-food-locations")
+def backfill_food_locations():
+    """Add the GeoJSON location field to food items that only have latitude/longitude"""
+    updated = run(backfill_food_item_locations())
+    typer.echo(f"Backfilled location on {updated} food items")
+
+
+@cli.command("backfill-order-snapshots")
+def backfill_order_snapshots(batch_size: int = typer.Option(1000, help="Orders per bulk write")):
+    """Copy food title/quantity/pickup address onto orders created before they were snapshotted"""
+    updated = run(backfill_order_food_snapshots(batch_size=batch_size))
+    typer.echo(f"Snapshotted food details on {updated} orders")
+
+
+@cli.command("check-user-stats")
+def check_user_stats(
+    repair: bool = typer.Option(False, help="Overwrite drifted counters with the recomputed values"),
+    user_id: str = typer.Option(None, help="Only check this user"),
+):
+    """Recompute the dashboard counters in user_stats and report any drift"""
+    drifted = run(user_stats.check(repair=repair, user_id=user_id))
+    for entry in drifted:
+        changes = ", ".join(f"{field} {stored} -> {expected}" for field, (stored, expected) in entry["differences"].items())
+        typer.echo(f"{entry['user_id']} ({entry['role']}): {changes}")
+    action = "Repaired" if repair else "Found"
+    typer.echo(f"{action} drift in {len(drifted)} user stats documents")
+
+
+@cli.command("migrate-datetimes")
+def migrate_datetimes(batch_size: int = typer.Option(1000, help="Documents per bulk write")):
+    """Convert ISO-string timestamps written by older releases to native BSON dates"""
+    converted = run(migrate_iso_strings_to_dates(db, batch_size=batch_size))
+    for collection_name, count in converted.items():
+        typer.echo(f"{collection_name}: converted {count} documents")
+
+
+SEEDED_COLLECTIONS = ["users", "food_items", "orders", "ratings", "messages", "donor_rating_stats", "user_stats"]
+
+
+async def seed_and_index(volumes, batch_size, concurrency, drop):
+    if drop:
+        for collection_name in SEEDED_COLLECTIONS:
+            await db.drop_collection(collection_name)
+
+    started = time.perf_counter()
+    counts = await seed_database(
+        db, volumes, batch_size=batch_size, concurrency=concurrency,
+        progress=lambda counts: typer.echo(f"\r{sum(counts.values())} documents inserted", nl=False)
+    )
+    typer.echo(f"\rInserted {sum(counts.values())} documents in {time.perf_counter() - started:.1f}s")
+
+    # Indexes after the bulk load (faster than maintaining them per insert); a no-op when they exist
+    await ensure_indexes(db)
+    # Derived aggregates: rating stats are rebuilt, dashboard counters recompute lazily,
+    # and list ETag markers start over so no client keeps a pre-seed page
+    await db.view_versions.delete_many({})
+    await rebuild_donor_rating_stats()
+    await db.user_stats.delete_many({})
+    return counts
+
+
+@cli.command("seed")
+def seed(
+    donors: int = typer.Option(1000, help="Donor accounts"),
+    recipients: int = typer.Option(10000, help="Recipient accounts"),
+    items_per_donor: int = typer.Option(100, help="Food listings per donor"),
+    order_rate: float = typer.Option(0.6, help="Share of listings that get an order"),
+    rating_rate: float = typer.Option(0.5, help="Share of completed orders that are rated"),
+    messages_per_order: int = typer.Option(3, help="Average chat messages per order"),
+    seed: int = typer.Option(1, help="Random seed; the same seed and volumes give the same data"),
+    batch_size: int = typer.Option(5000, help="Documents per insert_many"),
+    concurrency: int = typer.Option(4, help="insert_many batches in flight"),
+    drop: bool = typer.Option(False, help="Drop the seeded collections first"),
+    yes: bool = typer.Option(False, "--yes", help="Skip the confirmation prompt"),
+):
+    """Bulk-load deterministic synthetic data for load testing (never run against production)"""
+    if not yes:
+        action = f"Drop {', '.join(SEEDED_COLLECTIONS)} in" if drop else "Add synthetic data to"
+        typer.confirm(f"{action} database '{db.name}'?", abort=True)
+    volumes = Volumes(
+        donors=donors,
+        recipients=recipients,
+        items_per_donor=items_per_donor,
+        order_rate=order_rate,
+        rating_rate=rating_rate,
+        messages_per_order=messages_per_order,
+        seed=seed,
+    )
+    counts = run(seed_and_index(volumes, batch_size, concurrency, drop))
+    for collection_name, count in sorted(counts.items()):
+        typer.echo(f"{collection_name}: {count}")
+    typer.echo(f"Seeded users log in with password '{SEED_PASSWORD}'")
+
+
+if __name__ == "__main__":
+    cli()
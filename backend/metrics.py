@@ -0,0 +1,197 @@
+"""Prometheus metrics for the API.
+
+* HTTP: latency histogram, status-code counter and in-flight gauge per
+  method and route template (``/api/orders/{order_id}/pay``, never the raw
+  path, so label cardinality stays bounded).
+* MongoDB: command latency and count per command and collection, from a
+  pymongo CommandListener passed to the Motor client as an event listener.
+* Queries per request: every command issued while serving a request is
+  counted into that request's histogram observation. The counter travels in
+  a contextvar; Motor runs pymongo calls on its executor with a copy of the
+  caller's context, so the listener sees the same (mutable) counter object.
+* Anything with a stats() dict (the user cache) can be exported as gauges.
+
+With several workers, set PROMETHEUS_MULTIPROC_DIR in the environment (not
+.env: prometheus_client reads it on import) to a directory the workers share.
+/metrics then reports the sum over all workers; stats() gauges are left out,
+since they describe only the worker answering the scrape.
+"""
+import contextvars
+import os
+import threading
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest, multiprocess
+from prometheus_client.core import GaugeMetricFamily
+from pymongo import monitoring
+from starlette.routing import Match
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "saverfwd_http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route"],
+)
+HTTP_REQUESTS = Counter(
+    "saverfwd_http_requests_total",
+    "HTTP requests by route template and status code",
+    ["method", "route", "status"],
+)
+HTTP_IN_FLIGHT = Gauge(
+    "saverfwd_http_requests_in_flight",
+    "HTTP requests currently being served",
+    ["method", "route"],
+    multiprocess_mode="livesum",
+)
+QUERIES_PER_REQUEST = Histogram(
+    "saverfwd_http_request_mongo_commands",
+    "MongoDB commands issued while serving one request",
+    ["method", "route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, float("inf")),
+)
+MONGO_COMMAND_SECONDS = Histogram(
+    "saverfwd_mongo_command_duration_seconds",
+    "MongoDB command latency by command and collection",
+    ["command", "collection"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, float("inf")),
+)
+MONGO_COMMANDS = Counter(
+    "saverfwd_mongo_commands_total",
+    "MongoDB commands by command, collection and outcome",
+    ["command", "collection", "outcome"],
+)
+EXPIRED_FOOD_ITEMS = Counter(
+    "saverfwd_food_items_expired_total",
+    "Food items marked expired by the background expiry task",
+)
+EXPIRY_TASK_ERRORS = Counter(
+    "saverfwd_expiry_task_errors_total",
+    "Failed runs of the background expiry task",
+)
+
+# Handshakes and heartbeats are not work done for a request
+IGNORED_COMMANDS = {"hello", "ismaster", "isMaster", "ping", "saslStart", "saslContinue", "endSessions"}
+
+current_request = contextvars.ContextVar("current_request", default=None)
+
+
+class RequestContext:
+    """Route and mutable command counter of the request being served, shared with
+    the executor threads running pymongo"""
+
+    def __init__(self, method: str, route: str):
+        self.method = method
+        self.route = route
+        self.commands = 0
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    def __init__(self):
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        if event.command_name in IGNORED_COMMANDS:
+            return
+        # The collection is the command's value (find: "orders"); getMore names it separately
+        collection = event.command.get("collection") if event.command_name == "getMore" else event.command.get(event.command_name)
+        with self._lock:
+            self._collections[(event.connection_id, event.request_id)] = collection if isinstance(collection, str) else ""
+
+        request = current_request.get()
+        if request is not None:
+            request.commands += 1
+
+    def succeeded(self, event):
+        self._finished(event, "success")
+
+    def failed(self, event):
+        self._finished(event, "failure")
+
+    def _finished(self, event, outcome):
+        with self._lock:
+            collection = self._collections.pop((event.connection_id, event.request_id), None)
+        if collection is None:
+            return
+        MONGO_COMMAND_SECONDS.labels(event.command_name, collection).observe(event.duration_micros / 1_000_000)
+        MONGO_COMMANDS.labels(event.command_name, collection, outcome).inc()
+
+
+mongo_command_metrics = MongoCommandMetrics()
+
+
+def route_template(app, scope) -> str:
+    """Path template of the route that will serve this request"""
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = route_template(scope["app"], scope)
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        request = RequestContext(method, route)
+        token = current_request.set(request)
+        in_flight = HTTP_IN_FLIGHT.labels(method, route)
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUEST_SECONDS.labels(method, route).observe(time.perf_counter() - started)
+            HTTP_REQUESTS.labels(method, route, str(status_code)).inc()
+            QUERIES_PER_REQUEST.labels(method, route).observe(request.commands)
+            in_flight.dec()
+            current_request.reset(token)
+
+
+class StatsCollector:
+    """Exports the numeric values of stats() as gauges named saverfwd_<prefix>_<key>"""
+
+    def __init__(self, prefix: str, stats):
+        self.prefix = prefix
+        self.stats = stats
+
+    def collect(self):
+        for key, value in self.stats().items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                gauge = GaugeMetricFamily(f"saverfwd_{self.prefix}_{key}", f"{self.prefix} {key.replace('_', ' ')}")
+                gauge.add_metric([], value)
+                yield gauge
+
+
+_stats_collectors = {}
+
+
+def register_stats(prefix: str, stats):
+    # Re-registering replaces the earlier collector: spawned workers import server.py
+    # twice (as __mp_main__ and as server)
+    if prefix in _stats_collectors:
+        REGISTRY.unregister(_stats_collectors[prefix])
+    _stats_collectors[prefix] = StatsCollector(prefix, stats)
+    REGISTRY.register(_stats_collectors[prefix])
+
+
+def metrics_payload():
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,77 @@
+"""Data migrations for the SaverFwd MongoDB collections.
+
+Migrations are idempotent and run online: they work in small batches and only
+touch a field if it still holds the value that was read, so they can run while
+the API is serving traffic.
+"""
+import logging
+from datetime import datetime, timezone
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+# Datetime fields that older releases stored as ISO-8601 strings
+DATETIME_FIELDS = {
+    "users": ["created_at"],
+    "food_items": ["expiry_time", "pickup_window_start", "pickup_window_end", "created_at", "updated_at"],
+    "orders": ["created_at", "updated_at"],
+    "ratings": ["created_at", "updated_at"],
+    "messages": ["timestamp"],
+    "donor_rating_stats": ["updated_at"],
+}
+
+
+def parse_iso_datetime(value: str) -> datetime:
+    """Parse an ISO-8601 string as written by the old prepare_for_mongo into an aware UTC datetime"""
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+async def migrate_iso_strings_to_dates(db, batch_size: int = 1000):
+    """Convert ISO-string datetime fields to native BSON dates; returns converted documents per collection"""
+    converted = {}
+    for collection_name, fields in DATETIME_FIELDS.items():
+        collection = db[collection_name]
+        projection = {field: 1 for field in fields}
+        cursor = collection.find(
+            {"$or": [{field: {"$type": "string"}} for field in fields]},
+            projection,
+            batch_size=batch_size
+        )
+
+        operations = []
+        converted[collection_name] = 0
+        async for document in cursor:
+            updates = {}
+            for field in fields:
+                value = document.get(field)
+                if not isinstance(value, str):
+                    continue
+                try:
+                    updates[field] = parse_iso_datetime(value)
+                except ValueError:
+                    logger.warning("Skipping unparseable %s.%s on %s: %r", collection_name, field, document["_id"], value)
+            if not updates:
+                continue
+
+            # Only overwrite values nobody has changed since we read them
+            match = {"_id": document["_id"], **{field: document[field] for field in updates}}
+            operations.append(UpdateOne(match, {"$set": updates}))
+
+            if len(operations) >= batch_size:
+                result = await collection.bulk_write(operations, ordered=False)
+                converted[collection_name] += result.modified_count
+                operations = []
+
+        if operations:
+            result = await collection.bulk_write(operations, ordered=False)
+            converted[collection_name] += result.modified_count
+
+        logger.info("Converted datetime fields on %d %s documents", converted[collection_name], collection_name)
+
+    return converted
@@ -0,0 +1,204 @@
+"""Order state machine.
+
+Every transition is a single conditional find_one_and_update: the filter
+encodes the states the transition is allowed from, so two concurrent requests
+can never both win (for example two recipients claiming the same item).
+Transitions that change both an order and its food item run in a transaction
+when the deployment supports one (replica set or sharded cluster). On a
+standalone server they fall back to compensating writes.
+
+The happy path costs one round trip per document changed. The document is only
+read again when a transition is refused, to report why.
+
+When given a UserStats store, transitions also move the dashboard counters
+they affect, in the same transaction.
+"""
+import logging
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+from fastapi import HTTPException
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+#   food item: available -> claimed (donation) | sold (sale) -> available (order cancelled)
+#   order:     pending -> confirmed (paid) -> completed
+#              pending | confirmed -> cancelled (unless a purchase is already paid)
+CANCELLABLE_ORDER_STATUSES = ["pending", "confirmed"]
+CONFIRMABLE_ORDER_STATUSES = ["pending", "confirmed"]
+
+
+class OrderStateMachine:
+    def __init__(self, db, transactions: str = "auto", stats=None):
+        """`transactions` is "auto" (detect replica set), "on" or "off" """
+        self.db = db
+        self.transactions = transactions
+        self.stats = stats
+        self._use_transactions: Optional[bool] = None
+
+    async def supports_transactions(self) -> bool:
+        if self._use_transactions is None:
+            if self.transactions in ("on", "off"):
+                self._use_transactions = self.transactions == "on"
+            else:
+                hello = await self.db.client.admin.command("hello")
+                self._use_transactions = "setName" in hello or hello.get("msg") == "isdbgrid"
+            logger.info("Order transitions %s transactions", "use" if self._use_transactions else "do not use")
+        return self._use_transactions
+
+    async def _run(self, operation):
+        """Run operation(session) inside a transaction when supported, otherwise without a session"""
+        if not await self.supports_transactions():
+            return await operation(None)
+        async with await self.db.client.start_session() as session:
+            return await session.with_transaction(operation)
+
+    # Claim / purchase
+    async def claim_food_item(self, food_item_id: str, make_order: Callable[[dict], dict]):
+        """Atomically take an available item and record the order for it.
+
+        make_order(food_item) builds the order document from the claimed item.
+        Returns (order_document, food_item_after_claim).
+        """
+        async def claim(session):
+            now = datetime.now(timezone.utc)
+            food_item = await self.db.food_items.find_one_and_update(
+                {"id": food_item_id, "status": "available", "expiry_time": {"$gt": now}},
+                [{"$set": {
+                    "status": {"$cond": [{"$eq": ["$food_type", "donation"]}, "claimed", "sold"]},
+                    "updated_at": now
+                }}],
+                return_document=ReturnDocument.AFTER,
+                session=session
+            )
+            if food_item is None:
+                await self._refuse_claim(food_item_id, session)
+
+            order = make_order(food_item)
+            try:
+                await self.db.orders.insert_one(order, session=session)
+            except Exception:
+                if session is None:
+                    # No transaction to roll back; put the item back on offer
+                    await self.db.food_items.update_one(
+                        {"id": food_item_id, "status": food_item["status"]},
+                        {"$set": {"status": "available", "updated_at": datetime.now(timezone.utc)}}
+                    )
+                raise
+            if self.stats:
+                await self.stats.change(food_item["donor_id"], session, active_listings=-1)
+            return order, food_item
+
+        return await self._run(claim)
+
+    async def _refuse_claim(self, food_item_id, session):
+        if await self.db.food_items.find_one({"id": food_item_id}, {"_id": 1}, session=session) is None:
+            raise HTTPException(status_code=404, detail="Food item not found")
+        raise HTTPException(status_code=400, detail="Food item is not available")
+
+    # Payment
+    async def pay(self, order_id: str, recipient_id: str) -> dict:
+        """Mark an unpaid, open order as paid and confirmed"""
+        order = await self.db.orders.find_one_and_update(
+            {
+                "id": order_id,
+                "recipient_id": recipient_id,
+                "payment_status": {"$ne": "completed"},
+                "status": {"$in": CANCELLABLE_ORDER_STATUSES}
+            },
+            {"$set": {
+                "payment_status": "completed",
+                "status": "confirmed",
+                "updated_at": datetime.now(timezone.utc)
+            }},
+            return_document=ReturnDocument.AFTER
+        )
+        if order is None:
+            current = await self._owned_order(order_id, recipient_id, "You can only pay for your own orders")
+            if current["payment_status"] == "completed":
+                raise HTTPException(status_code=400, detail="Order already paid")
+            raise HTTPException(status_code=400, detail=f"Order cannot be paid. Current status: {current['status']}")
+        return order
+
+    # Pickup confirmation
+    async def confirm_pickup(self, order_id: str, recipient_id: str) -> dict:
+        """Complete an open order; purchases must be paid first"""
+        async def confirm(session):
+            order = await self.db.orders.find_one_and_update(
+                {
+                    "id": order_id,
+                    "recipient_id": recipient_id,
+                    "status": {"$in": CONFIRMABLE_ORDER_STATUSES},
+                    "$or": [{"order_type": "claim"}, {"payment_status": "completed"}]
+                },
+                {"$set": {
+                    "status": "completed",
+                    "updated_at": datetime.now(timezone.utc)
+                }},
+                return_document=ReturnDocument.AFTER,
+                session=session
+            )
+            if order is None:
+                current = await self._owned_order(order_id, recipient_id, "You can only confirm your own orders", session)
+                if current["status"] not in CONFIRMABLE_ORDER_STATUSES:
+                    raise HTTPException(status_code=400, detail=f"Order cannot be confirmed. Current status: {current['status']}")
+                raise HTTPException(status_code=400, detail="Payment must be completed before confirming pickup")
+            if self.stats:
+                await self.stats.order_completed(order, session)
+            return order
+
+        return await self._run(confirm)
+
+    # Cancellation
+    async def cancel(self, order_id: str, recipient_id: str):
+        """Cancel an open order and put its food item back on offer.
+
+        Returns (cancelled_order, food_item_after) where the food item is None
+        if it no longer exists.
+        """
+        async def cancel(session):
+            now = datetime.now(timezone.utc)
+            order = await self.db.orders.find_one_and_update(
+                {
+                    "id": order_id,
+                    "recipient_id": recipient_id,
+                    "status": {"$in": CANCELLABLE_ORDER_STATUSES},
+                    # Paid purchases cannot be cancelled
+                    "$or": [{"order_type": "claim"}, {"payment_status": {"$ne": "completed"}}]
+                },
+                {"$set": {"status": "cancelled", "updated_at": now}},
+                return_document=ReturnDocument.AFTER,
+                session=session
+            )
+            if order is None:
+                await self._refuse_cancel(order_id, recipient_id, session)
+
+            food_item = await self.db.food_items.find_one_and_update(
+                {"id": order["food_item_id"], "status": {"$in": ["claimed", "sold"]}},
+                {"$set": {"status": "available", "updated_at": now}},
+                return_document=ReturnDocument.AFTER,
+                session=session
+            )
+            if food_item and self.stats:
+                await self.stats.change(food_item["donor_id"], session, active_listings=1)
+            return order, food_item
+
+        return await self._run(cancel)
+
+    async def _refuse_cancel(self, order_id, recipient_id, session):
+        current = await self._owned_order(order_id, recipient_id, "You can only cancel your own orders", session)
+        if current["status"] == "completed":
+            raise HTTPException(status_code=400, detail="Cannot cancel completed orders")
+        if current["status"] == "cancelled":
+            raise HTTPException(status_code=400, detail="Order is already cancelled")
+        raise HTTPException(status_code=400, detail="Cannot cancel paid orders")
+
+    async def _owned_order(self, order_id, recipient_id, forbidden_detail, session=None) -> dict:
+        """Read an order to explain a refused transition (404/403 first, like the old handlers)"""
+        order = await self.db.orders.find_one({"id": order_id}, session=session)
+        if order is None:
+            raise HTTPException(status_code=404, detail="Order not found")
+        if order["recipient_id"] != recipient_id:
+            raise HTTPException(status_code=403, detail=forbidden_detail)
+        return order
@@ -0,0 +1,177 @@
+"""Pub/sub hub for pushing realtime events to connected clients.
+
+Handlers publish events to a channel (for example ``user:<id>``); every local
+subscriber of that channel gets the event on its own bounded queue, which a
+WebSocket or Server-Sent Events handler drains. Publishing goes through a
+Broker: the default InProcessBroker delivers straight to this process, and a
+broker that fans out across processes (see Broker) can be installed with
+RealtimeHub.set_broker() when running several workers. MongoBroker does that
+through a capped collection every process tails.
+"""
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid, OperationFailure
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIBER_QUEUE_SIZE = 100
+
+Deliver = Callable[[str, dict], Awaitable[None]]
+
+
+class Broker(ABC):
+    """Transport between publishers and the subscribers of every process.
+
+    A cross-process broker publishes to shared infrastructure and, once
+    started, calls ``deliver(channel, event)`` for every event published by any
+    process, including its own.
+    """
+
+    @abstractmethod
+    async def start(self, deliver: Deliver):
+        ...
+
+    @abstractmethod
+    async def publish(self, channel: str, event: dict):
+        ...
+
+    async def stop(self):
+        pass
+
+
+class InProcessBroker(Broker):
+    """Delivers events only to subscribers in the current process"""
+
+    def __init__(self):
+        self._deliver: Optional[Deliver] = None
+
+    async def start(self, deliver: Deliver):
+        self._deliver = deliver
+
+    async def publish(self, channel: str, event: dict):
+        if self._deliver is not None:
+            await self._deliver(channel, event)
+
+
+class MongoBroker(Broker):
+    """Fans events out to every process through a capped collection.
+
+    Each process inserts the events it publishes and tails the collection with
+    a tailable cursor that waits on the server for new documents. Old events
+    roll off once the collection reaches size_bytes; a process only delivers
+    events inserted after it started.
+    """
+
+    RETRY_SECONDS = 1
+
+    def __init__(self, db, collection_name: str = "realtime_events", size_bytes: int = 16 * 1024 * 1024):
+        self.db = db
+        self.collection = db[collection_name]
+        self.size_bytes = size_bytes
+        self._deliver: Optional[Deliver] = None
+        self._last_id = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, deliver: Deliver):
+        self._deliver = deliver
+        try:
+            await self.db.create_collection(self.collection.name, capped=True, size=self.size_bytes)
+        except CollectionInvalid:
+            pass  # Created by another process
+        except OperationFailure as e:
+            # NamespaceExists: another worker created it between the driver's check and ours
+            if e.code != 48:
+                raise
+        latest = await self.collection.find_one({}, {"_id": 1}, sort=[("$natural", -1)])
+        self._last_id = latest["_id"] if latest else None
+        self._task = asyncio.create_task(self._tail())
+
+    async def publish(self, channel: str, event: dict):
+        await self.collection.insert_one({"channel": channel, "event": event})
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _tail(self):
+        while True:
+            query = {"_id": {"$gt": self._last_id}} if self._last_id is not None else {}
+            cursor = self.collection.find(query, cursor_type=CursorType.TAILABLE_AWAIT)
+            try:
+                # Each pass ends when the server's await times out with nothing new
+                while cursor.alive:
+                    async for document in cursor:
+                        self._last_id = document["_id"]
+                        await self._deliver(document["channel"], document["event"])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Realtime event tail failed; restarting")
+            finally:
+                await cursor.close()
+            # A tailable cursor on an empty collection dies straight away
+            await asyncio.sleep(self.RETRY_SECONDS)
+
+
+class RealtimeHub:
+    """Channel subscriptions for this process, fed by the configured broker"""
+
+    def __init__(self, broker: Optional[Broker] = None):
+        self.broker = broker or InProcessBroker()
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+
+    def set_broker(self, broker: Broker):
+        """Replace the broker; call before start()"""
+        self.broker = broker
+
+    async def start(self):
+        await self.broker.start(self._deliver_local)
+
+    async def stop(self):
+        await self.broker.stop()
+
+    def subscribe(self, channel: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers[channel].add(queue)
+        return queue
+
+    def unsubscribe(self, channel: str, queue: asyncio.Queue):
+        subscribers = self._subscribers.get(channel)
+        if subscribers is None:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            del self._subscribers[channel]
+
+    def subscriber_count(self, channel: str) -> int:
+        return len(self._subscribers.get(channel, ()))
+
+    async def publish(self, channel: str, event: dict):
+        """Publish an event; failures are logged so a push problem never fails the request"""
+        try:
+            await self.broker.publish(channel, event)
+        except Exception:
+            logger.exception("Failed to publish realtime event to %s", channel)
+
+    async def _deliver_local(self, channel: str, event: dict):
+        for queue in list(self._subscribers.get(channel, ())):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # The client is not keeping up; drop its backlog and tell it to refetch
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"type": "resync"})
+
+
+hub = RealtimeHub()
@@ -1,13 +1,22 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Request, Response, WebSocket, WebSocketDisconnect, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, UpdateOne
 import os
 import logging
 import asyncio
+import base64
+import functools
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from pathlib import Path
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, Field, EmailStr, TypeAdapter, ValidationError
 from typing import List, Optional, Literal
 import uuid
 from uuid import uuid4
@@ -15,24 +24,116 @@ from datetime import datetime, timezone, timedelta
 import jwt
 from passlib.context import CryptContext
 
+from compression import CompressionMiddleware
+from indexes import ensure_indexes
+from leases import LeasedJob
+from loaders import Loaders
+from metrics import EXPIRED_FOOD_ITEMS, EXPIRY_TASK_ERRORS, MetricsMiddleware, metrics_payload, mongo_command_metrics, register_stats
+from order_state import OrderStateMachine
+from realtime import MongoBroker, hub
+from slow_queries import SlowQueryDetector
+from user_cache import UserCache
+from user_stats import UserStats, stats_fields
+from view_versions import LISTINGS, ViewVersions
+
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+# Opt-in diagnostics: record slow reads per route and explain a sample of them
+slow_query_detector = SlowQueryDetector(
+    enabled=os.environ.get("SLOW_QUERY_DIAGNOSTICS", "false").lower() == "true",
+    threshold_ms=float(os.environ.get("SLOW_QUERY_THRESHOLD_MS", 100)),
+    sample_rate=float(os.environ.get("SLOW_QUERY_SAMPLE_RATE", 1.0)),
+    explain_rate=float(os.environ.get("SLOW_QUERY_EXPLAIN_RATE", 0.1)),
+    examined_ratio=float(os.environ.get("SLOW_QUERY_EXAMINED_RATIO", 100))
+)
+
+# Datetimes are stored as native BSON dates and decoded as timezone-aware UTC.
+# The command listeners feed the per-collection Mongo metrics on /metrics and the slow-query detector
+client = AsyncIOMotorClient(
+    mongo_url,
+    tz_aware=True,
+    tzinfo=timezone.utc,
+    event_listeners=[mongo_command_metrics, slow_query_detector]
+)
 db = client[os.environ['DB_NAME']]
 
+# Order transitions; ORDER_TRANSACTIONS is auto (use them on replica sets), on or off
+user_stats = UserStats(db)
+# Change markers for the ETags of polled list views
+view_versions = ViewVersions(db)
+order_states = OrderStateMachine(db, transactions=os.environ.get("ORDER_TRANSACTIONS", "auto"), stats=user_stats)
+
+# Multi-worker mode: WEB_CONCURRENCY uvicorn workers (python server.py). Singleton
+# background jobs run only on the instance holding their lease in job_leases
+WEB_CONCURRENCY = int(os.environ.get("WEB_CONCURRENCY", 1))
+JOB_LEASE_TTL_SECONDS = float(os.environ.get("JOB_LEASE_TTL_SECONDS", 15))
+# Realtime events: memory (this process only), mongo (every process), or auto (mongo with several workers)
+REALTIME_BROKER = os.environ.get("REALTIME_BROKER", "auto").lower()
+if REALTIME_BROKER == "mongo" or (REALTIME_BROKER == "auto" and WEB_CONCURRENCY > 1):
+    hub.set_broker(MongoBroker(db))
+
+# Expiry scheduling
+EXPIRY_MAX_SLEEP_SECONDS = 300  # Upper bound between runs when nothing is due sooner
+EXPIRY_MIN_SLEEP_SECONDS = 1
+# Writes announce earlier expiries here so the lease holder wakes up, whichever worker it is on
+EXPIRY_CHANNEL = "jobs:expire_food_items"
+expiry_wakeup = asyncio.Event()
+next_expiry_check: Optional[datetime] = None
+
+# Pagination
+MAX_PAGE_SIZE = 100
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Food listing change feed (Server-Sent Events)
+FOOD_FEED_RECIPIENTS = "food_items:recipients"
+SSE_KEEPALIVE_SECONDS = 15
+
+# Geo search
+MAX_NEARBY_RADIUS_KM = 100
+
 # Security
 SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'your-secret-key-change-in-production')
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30 * 24 * 60  # 30 days
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", 12))
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+# bcrypt takes tens to hundreds of milliseconds per call, so it runs in a
+# dedicated thread pool (bcrypt releases the GIL) and never on the event loop.
+# At most PASSWORD_HASH_WORKERS calls run at once; callers that wait longer than
+# PASSWORD_HASH_QUEUE_TIMEOUT seconds for a slot get a 503.
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", 4))
+PASSWORD_HASH_QUEUE_TIMEOUT = float(os.environ.get("PASSWORD_HASH_QUEUE_TIMEOUT", 5))
+password_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+password_hash_slots = asyncio.Semaphore(PASSWORD_HASH_WORKERS)
 security = HTTPBearer()
 
+# Authenticated user cache
+user_cache = UserCache(
+    max_size=int(os.environ.get("USER_CACHE_SIZE", 10000)),
+    ttl_seconds=float(os.environ.get("USER_CACHE_TTL_SECONDS", 60))
+)
+register_stats("user_cache", user_cache.stats)
+# When enabled, role checks trust the role claim in the signed token and skip the
+# user lookup; a deactivated user keeps passing them until the token expires
+TRUST_TOKEN_ROLE_CLAIMS = os.environ.get("TRUST_TOKEN_ROLE_CLAIMS", "false").lower() == "true"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background work on boot; stop it and wait for its tasks on shutdown"""
+    await start_background_tasks()
+    try:
+        yield
+    finally:
+        await stop_background_tasks()
+
 # Create the main app without a prefix
-app = FastAPI(title="SaverFwd API", version="1.0.0")
+# orjson renders responses; handlers with a response_model skip jsonable_encoder entirely
+app = FastAPI(title="SaverFwd API", version="1.0.0", default_response_class=ORJSONResponse, lifespan=lifespan)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -68,6 +169,11 @@ class UserLogin(BaseModel):
     email: EmailStr
     password: str
 
+class AuthenticatedUser(BaseModel):
+    """The identity used for authorization checks"""
+    id: str
+    role: Literal["donor", "recipient"]
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -129,6 +235,10 @@ class FoodItemWithRating(FoodItem):
     donor_average_rating: Optional[float] = None
     donor_total_ratings: Optional[int] = None
 
+class FoodItemNearby(FoodItemWithRating):
+    """FoodItemWithRating with the distance from the searched location"""
+    distance_km: float
+
 # Order/Claim Models
 class Order(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -141,6 +251,10 @@ class Order(BaseModel):
     delivery_method: Literal["pickup", "delivery"] = "pickup"
     delivery_address: Optional[str] = None
     status: Literal["pending", "confirmed", "completed", "cancelled"] = "pending"
+    # Snapshot of the immutable food details at order time, so reads need no join
+    food_title: Optional[str] = None
+    food_quantity: Optional[str] = None
+    pickup_address: Optional[str] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
@@ -176,11 +290,26 @@ class ChatConversation(BaseModel):
     messages: List[Message]
 
 # Helper Functions
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+async def run_password_hashing(func, *args):
+    """Run a bcrypt call in the password hashing pool, waiting at most PASSWORD_HASH_QUEUE_TIMEOUT for a slot"""
+    try:
+        await asyncio.wait_for(password_hash_slots.acquire(), timeout=PASSWORD_HASH_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many sign-in requests in progress, please try again",
+            headers={"Retry-After": "1"}
+        )
+    try:
+        return await asyncio.get_running_loop().run_in_executor(password_hash_executor, func, *args)
+    finally:
+        password_hash_slots.release()
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def verify_password(plain_password, hashed_password):
+    return await run_password_hashing(pwd_context.verify, plain_password, hashed_password)
+
+async def get_password_hash(password):
+    return await run_password_hashing(pwd_context.hash, password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -192,75 +321,429 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    credentials_exception = HTTPException(
+def credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def decode_access_token(token: str) -> dict:
+    """Verify a JWT and return its claims, raising 401 if it is invalid"""
     try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
     except jwt.PyJWTError:
-        raise credentials_exception
+        raise credentials_exception()
+    if payload.get("sub") is None:
+        raise credentials_exception()
+    return payload
+
+async def authenticate_token(token: str) -> User:
+    """Resolve a bearer token to its user, raising 401 if it is invalid"""
+    user_id = decode_access_token(token)["sub"]
     
-    user = await db.users.find_one({"id": user_id})
+    user = user_cache.get(user_id)
     if user is None:
-        raise credentials_exception
-    return User(**user)
+        user_doc = await db.users.find_one({"id": user_id}, {"_id": 0, "hashed_password": 0})
+        if user_doc is None:
+            raise credentials_exception()
+        user = User(**user_doc)
+        user_cache.set(user_id, user)
+    
+    if not user.is_active:
+        raise credentials_exception()
+    return user
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return await authenticate_token(credentials.credentials)
+
+async def get_current_principal(credentials: HTTPAuthorizationCredentials = Depends(security)) -> AuthenticatedUser:
+    """Id and role of the caller, from signed token claims when TRUST_TOKEN_ROLE_CLAIMS is on"""
+    if TRUST_TOKEN_ROLE_CLAIMS:
+        payload = decode_access_token(credentials.credentials)
+        if payload.get("role") in ("donor", "recipient"):
+            return AuthenticatedUser(id=payload["sub"], role=payload["role"])
+    
+    user = await authenticate_token(credentials.credentials)
+    return AuthenticatedUser(id=user.id, role=user.role)
+
+def get_loaders() -> Loaders:
+    """Batching user/food item loaders shared by everything that serves one request"""
+    return Loaders(db)
+
+def user_channel(user_id: str) -> str:
+    """Realtime channel carrying chat events for one user"""
+    return f"user:{user_id}"
+
+async def mark_conversation_read(reader_id: str, contact_id: str):
+    """Mark messages from contact_id to reader_id as read and push a read receipt to the sender"""
+    result = await db.messages.update_many(
+        {
+            "sender_id": contact_id,
+            "receiver_id": reader_id,
+            "is_read": False
+        },
+        {"$set": {"is_read": True}}
+    )
+    if result.modified_count:
+        # Unread counts on both sides' contact lists
+        await view_versions.bump("messages", reader_id, contact_id)
+        await hub.publish(user_channel(contact_id), {
+            "type": "read",
+            "reader_id": reader_id,
+            "read_at": datetime.now(timezone.utc).isoformat()
+        })
+    return result.modified_count
 
 def prepare_for_mongo(data):
-    """Convert datetime objects to ISO strings for MongoDB storage"""
+    """Normalize datetime values to timezone-aware UTC so they are stored as BSON dates"""
     if isinstance(data, dict):
         for key, value in data.items():
             if isinstance(value, datetime):
-                # Ensure timezone aware datetime and consistent format
+                # Naive datetimes are treated as UTC
                 if value.tzinfo is None:
                     value = value.replace(tzinfo=timezone.utc)
-                data[key] = value.isoformat()
+                data[key] = value.astimezone(timezone.utc)
     return data
 
-def parse_from_mongo(item):
-    """Convert ISO strings back to datetime objects"""
-    if isinstance(item, dict):
-        for key, value in item.items():
-            if isinstance(value, str) and key.endswith(('_at', '_time', 'expiry_time', 'pickup_window_start', 'pickup_window_end')):
-                try:
-                    # Handle various ISO formats
-                    if value.endswith('Z'):
-                        value = value.replace('Z', '+00:00')
-                    item[key] = datetime.fromisoformat(value)
-                    # Ensure timezone aware
-                    if item[key].tzinfo is None:
-                        item[key] = item[key].replace(tzinfo=timezone.utc)
-                except Exception as e:
-                    # If parsing fails, keep as string
-                    pass
-    return item
-
 async def auto_expire_food_items():
-    """Automatically mark expired food items as expired"""
+    """Mark every available item past its expiry time as expired in a single update"""
+    # BSON dates keep milliseconds; truncate so updated_at can be matched after the write
     current_time = datetime.now(timezone.utc)
+    current_time = current_time.replace(microsecond=current_time.microsecond // 1000 * 1000)
     
-    # Find all available items that have passed their expiry time
-    expired_items = await db.food_items.find({
-        "status": "available",
-        "expiry_time": {"$lt": current_time.isoformat()}
-    }).to_list(length=None)
+    # Ids are needed for the change feed; the status_expiry index covers the filter
+    due_items = await db.food_items.find(
+        {
+            "status": "available",
+            "expiry_time": {"$lte": current_time}
+        },
+        {"_id": 0, "id": 1, "donor_id": 1}
+    ).to_list(length=None)
+    if not due_items:
+        return 0
+    
+    # Re-check the whole condition: an item can be claimed or have its expiry pushed back
+    # between the two queries
+    due_ids = [item["id"] for item in due_items]
+    result = await db.food_items.update_many(
+        {
+            "id": {"$in": due_ids},
+            "status": "available",
+            "expiry_time": {"$lte": current_time}
+        },
+        {"$set": {
+            "status": "expired",
+            "updated_at": current_time
+        }}
+    )
+    if not result.modified_count:
+        return 0
     
-    # Update expired items
+    # Only the items this update changed get an event
+    expired_items = await db.food_items.find(
+        {"id": {"$in": due_ids}, "status": "expired", "updated_at": current_time},
+        {"_id": 0, "id": 1, "donor_id": 1}
+    ).to_list(length=None)
+    
+    # Counters follow the documents actually expired; a claimed item was already decremented
+    expired_per_donor = {}
     for item in expired_items:
-        await db.food_items.update_one(
-            {"id": item["id"]},
-            {"$set": {
-                "status": "expired",
-                "updated_at": current_time.isoformat()
-            }}
-        )
+        expired_per_donor[item["donor_id"]] = expired_per_donor.get(item["donor_id"], 0) + 1
+    for donor_id, expired in expired_per_donor.items():
+        await user_stats.change(donor_id, active_listings=-expired)
     
-    return len(expired_items)
+    for item in expired_items:
+        await publish_food_item_event("expired", item["id"], item["donor_id"], "expired")
+    
+    return result.modified_count
+
+async def orders_changed(order: dict):
+    """Move the order list ETag markers of both sides of an order"""
+    await view_versions.bump("orders", order["donor_id"], order["recipient_id"])
+
+def donor_food_channel(donor_id: str) -> str:
+    """Realtime channel carrying changes to one donor's own listings"""
+    return f"food_items:donor:{donor_id}"
+
+async def publish_food_item_event(event_type: str, item_id: str, donor_id: str, item_status: str, item=None):
+    """Push a listing change to its donor and to recipients.
+
+    Recipients only receive the item body while it is available; any other
+    status tells their client to drop the item from the list. Every listing
+    write comes through here, so this also moves the /food-items ETag markers.
+    The write has already been stored, so failures here are logged, not raised.
+    """
+    try:
+        await view_versions.bump("food_items", donor_id, LISTINGS)
+    except Exception:
+        logger.exception("Failed to move the food_items markers for %s", item_id)
+    try:
+        event = {"type": event_type, "item_id": item_id, "status": item_status}
+        if item is not None:
+            event["item"] = jsonable_encoder(FoodItem(**item))
+        await hub.publish(donor_food_channel(donor_id), event)
+        
+        recipient_event = {"type": event_type, "item_id": item_id, "status": item_status}
+        if item is not None and item_status == "available":
+            enriched = await enrich_food_items_with_donor_info([item])
+            recipient_event["item"] = jsonable_encoder(FoodItemWithRating(**enriched[0]))
+        await hub.publish(FOOD_FEED_RECIPIENTS, recipient_event)
+    except Exception:
+        logger.exception("Failed to publish the %s event for food item %s", event_type, item_id)
+
+async def schedule_expiry_check(expiry_time: datetime):
+    """Tell the expiry task, on whichever instance runs it, about a newly scheduled expiry"""
+    if expiry_time.tzinfo is None:
+        expiry_time = expiry_time.replace(tzinfo=timezone.utc)
+    # Anything due later is picked up by the task's regular run anyway
+    if expiry_time < datetime.now(timezone.utc) + timedelta(seconds=EXPIRY_MAX_SLEEP_SECONDS):
+        await hub.publish(EXPIRY_CHANNEL, {"type": "scheduled", "expiry_time": expiry_time.isoformat()})
+
+async def relay_expiry_hints(queue: asyncio.Queue):
+    """Wake the expiry task when an announced expiry is due before its next planned run"""
+    while True:
+        event = await queue.get()
+        if event.get("type") == "resync":
+            # Hints were dropped; one of them may have been due early
+            expiry_wakeup.set()
+            continue
+        try:
+            expiry_time = datetime.fromisoformat(event["expiry_time"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if next_expiry_check is None or expiry_time < next_expiry_check:
+            expiry_wakeup.set()
+
+def page_size(limit: int) -> int:
+    """Clamp a requested page size to 1..MAX_PAGE_SIZE"""
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+def encode_cursor(sort_value: datetime, item_id: str) -> str:
+    """Opaque cursor for the (sort_value, id) keyset position of the last item on a page"""
+    payload = json.dumps([sort_value.isoformat(), item_id]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, item_id = json.loads(payload)
+        return datetime.fromisoformat(sort_value), str(item_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def after_cursor(query: dict, cursor: Optional[str], sort_field: str, id_field: str = "id", descending: bool = True):
+    """Restrict a query to documents that sort after the cursor in (sort_field, id_field) order"""
+    if not cursor:
+        return query
+    sort_value, item_id = decode_cursor(cursor)
+    op = "$lt" if descending else "$gt"
+    keyset = {"$or": [
+        {sort_field: {op: sort_value}},
+        {sort_field: sort_value, id_field: {op: item_id}}
+    ]}
+    return {"$and": [query, keyset]} if query else keyset
+
+def take_page(documents: list, limit: int, response: Response, sort_field: str, id_field: str = "id"):
+    """Trim a limit+1 fetch to one page and advertise the next cursor when more remain"""
+    if len(documents) > limit:
+        documents = documents[:limit]
+        last = documents[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last[sort_field], last[id_field])
+    return documents
+
+# Read path: list endpoints fetch only the fields a model declares, then validate
+# and serialize the stored documents in a single pydantic-core pass instead of
+# building models per item and letting FastAPI validate the result once more
+def model_projection(model) -> dict:
+    """Mongo projection for exactly the fields a model declares"""
+    return {"_id": 0, **{field: 1 for field in model.model_fields}}
+
+@functools.lru_cache(maxsize=None)
+def json_adapter(model) -> TypeAdapter:
+    return TypeAdapter(model)
+
+def validated_json(model, content, response: Response) -> Response:
+    """Validate stored documents against `model` (e.g. List[Order]) and serialize them in one pass.
+
+    Stands in for response_model handling, which dumps, validates again and
+    then serializes. Undeclared keys are dropped; model instances are not
+    revalidated. Headers set on `response` (cursor, ETag) are carried over.
+    """
+    adapter = json_adapter(model)
+    body = adapter.dump_json(adapter.validate_python(content))
+    return Response(content=body, media_type="application/json", headers=dict(response.headers))
+
+def view_etag(request: Request, user_id: str, *versions) -> str:
+    """Weak ETag for one user's view of an endpoint (path + query string) at the given data versions"""
+    payload = json.dumps([request.url.path, request.url.query, user_id, *versions], default=str)
+    return f'W/"{hashlib.sha1(payload.encode()).hexdigest()}"'
+
+def not_modified(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """Attach the validator headers; return a 304 to send instead when the client already has this version"""
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    response.headers.update(headers)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        # Weak comparison: W/ prefixes are ignored
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if "*" in candidates or etag.removeprefix("W/") in candidates:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return None
+
+ORDER_FOOD_FIELDS = {"title": "food_title", "quantity": "food_quantity", "pickup_address": "pickup_address"}
+
+async def attach_food_details(orders, loaders: Optional[Loaders] = None):
+    """Fill food title/quantity/pickup address on orders created before they were snapshotted, in one query"""
+    missing = [order for order in orders if order.get("food_title") is None]
+    if not missing:
+        return orders
+    
+    loaders = loaders or Loaders(db)
+    food_items = await loaders.food_items.load_many(order["food_item_id"] for order in missing)
+    
+    for order, food_item in zip(missing, food_items):
+        if food_item:
+            for food_field, order_field in ORDER_FOOD_FIELDS.items():
+                order[order_field] = food_item.get(food_field)
+    return orders
+
+async def backfill_order_food_snapshots(batch_size: int = 1000):
+    """Copy food details onto orders created before they were snapshotted"""
+    updated = 0
+    cursor = db.orders.find({"food_title": {"$exists": False}}, {"_id": 1, "food_item_id": 1}, batch_size=batch_size)
+    batch = []
+    async for order in cursor:
+        batch.append(order)
+        if len(batch) >= batch_size:
+            updated += await _write_order_food_snapshots(batch)
+            batch = []
+    if batch:
+        updated += await _write_order_food_snapshots(batch)
+    return updated
+
+async def _write_order_food_snapshots(orders):
+    await attach_food_details(orders)
+    operations = [
+        UpdateOne(
+            {"_id": order["_id"]},
+            {"$set": {order_field: order.get(order_field) for order_field in ORDER_FOOD_FIELDS.values()}}
+        )
+        for order in orders
+        if order.get("food_title") is not None
+    ]
+    if not operations:
+        return 0
+    result = await db.orders.bulk_write(operations, ordered=False)
+    return result.modified_count
+
+def geo_point(latitude, longitude):
+    """GeoJSON point for the 2dsphere-indexed `location` field (GeoJSON is [lng, lat])"""
+    return {"type": "Point", "coordinates": [longitude, latitude]}
+
+async def backfill_food_item_locations():
+    """Populate `location` from the latitude/longitude floats on items that predate it"""
+    result = await db.food_items.update_many(
+        {
+            "location": {"$exists": False},
+            "latitude": {"$type": "number"},
+            "longitude": {"$type": "number"}
+        },
+        [{"$set": {"location": {"type": "Point", "coordinates": ["$longitude", "$latitude"]}}}]
+    )
+    return result.modified_count
+
+async def enrich_food_items_with_donor_info(food_items, loaders: Optional[Loaders] = None):
+    """Attach donor profile and rating summary to food items in a constant number of queries"""
+    if not food_items:
+        return []
+
+    # Both loaders are dispatched in the same tick: one query for the donor profiles on the
+    # page and one indexed read of their maintained rating aggregates, run concurrently
+    loaders = loaders or Loaders(db)
+    donor_ids = [item["donor_id"] for item in food_items]
+    donors, rating_stats = await asyncio.gather(
+        loaders.users.load_many(donor_ids),
+        loaders.donor_rating_stats.load_many(donor_ids),
+    )
+
+    enhanced_items = []
+    for item, donor, stat in zip(food_items, donors, rating_stats):
+        enhanced_item = item.copy()
+
+        if donor:
+            enhanced_item["donor_name"] = donor.get("full_name", "Unknown Donor")
+            enhanced_item["donor_organization"] = donor.get("organization_name")
+
+        if stat and stat.get("count"):
+            enhanced_item["donor_average_rating"] = round(stat["sum"] / stat["count"], 1)
+            enhanced_item["donor_total_ratings"] = stat["count"]
+        else:
+            enhanced_item["donor_average_rating"] = None
+            enhanced_item["donor_total_ratings"] = 0
+
+        enhanced_items.append(enhanced_item)
+
+    return enhanced_items
+
+def empty_rating_distribution():
+    return {"5": 0, "4": 0, "3": 0, "2": 0, "1": 0}
+
+async def record_rating_change(donor_id: str, new_rating: int, old_rating: Optional[int] = None):
+    """Fold a new or changed rating into the donor's maintained rating aggregate"""
+    if old_rating == new_rating:
+        return
+
+    increments = {
+        "sum": new_rating - (old_rating or 0),
+        f"distribution.{new_rating}": 1
+    }
+    if old_rating is None:
+        increments["count"] = 1
+    else:
+        increments[f"distribution.{old_rating}"] = -1
+
+    await db.donor_rating_stats.update_one(
+        {"donor_id": donor_id},
+        {
+            "$inc": increments,
+            "$set": {"updated_at": datetime.now(timezone.utc)}
+        },
+        upsert=True
+    )
+    # Ratings are shown next to every listing recipients see
+    await view_versions.bump("ratings", LISTINGS)
+
+async def rebuild_donor_rating_stats():
+    """Recompute every donor's rating aggregate from the ratings collection (backfill/repair)"""
+    grouped = await db.ratings.aggregate([
+        {"$group": {"_id": {"donor_id": "$donor_id", "rating": "$rating"}, "count": {"$sum": 1}}}
+    ]).to_list(length=None)
+
+    stats_by_donor = {}
+    for group in grouped:
+        donor_id = group["_id"]["donor_id"]
+        rating = group["_id"]["rating"]
+        stats = stats_by_donor.setdefault(donor_id, {
+            "donor_id": donor_id,
+            "count": 0,
+            "sum": 0,
+            "distribution": empty_rating_distribution()
+        })
+        stats["count"] += group["count"]
+        stats["sum"] += rating * group["count"]
+        stats["distribution"][str(rating)] += group["count"]
+
+    updated_at = datetime.now(timezone.utc)
+    for stats in stats_by_donor.values():
+        stats["updated_at"] = updated_at
+        await db.donor_rating_stats.replace_one({"donor_id": stats["donor_id"]}, stats, upsert=True)
+
+    # Donors whose ratings have all disappeared should not keep a stale aggregate
+    await db.donor_rating_stats.delete_many({"donor_id": {"$nin": list(stats_by_donor)}})
+    await view_versions.bump("ratings", LISTINGS)
+
+    return len(stats_by_donor)
 
 # Basic Routes
 @api_router.get("/")
@@ -281,7 +764,7 @@ async def register(user_create: UserCreate):
     
     # Create new user
     user_dict = user_create.dict()
-    user_dict["password"] = get_password_hash(user_create.password)
+    user_dict["password"] = await get_password_hash(user_create.password)
     user_obj = User(**{k: v for k, v in user_dict.items() if k != "password"})
     
     # Store in database
@@ -292,7 +775,7 @@ async def register(user_create: UserCreate):
     # Create access token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user_obj.id}, expires_delta=access_token_expires
+        data={"sub": user_obj.id, "role": user_obj.role}, expires_delta=access_token_expires
     )
     
     return Token(access_token=access_token, token_type="bearer", user=user_obj)
@@ -303,16 +786,16 @@ async def login(user_login: UserLogin):
     if not user:
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
-    if not verify_password(user_login.password, user["hashed_password"]):
+    if not await verify_password(user_login.password, user["hashed_password"]):
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
     # Create access token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user["id"]}, expires_delta=access_token_expires
+        data={"sub": user["id"], "role": user["role"]}, expires_delta=access_token_expires
     )
     
-    user_obj = User(**parse_from_mongo(user))
+    user_obj = User(**user)
     return Token(access_token=access_token, token_type="bearer", user=user_obj)
 
 @api_router.get("/auth/me", response_model=User)
@@ -321,7 +804,7 @@ async def get_current_user_info(current_user: User = Depends(get_current_user)):
 
 # Food Item Routes
 @api_router.post("/food-items", response_model=FoodItem)
-async def create_food_item(food_item: FoodItemCreate, current_user: User = Depends(get_current_user)):
+async def create_food_item(food_item: FoodItemCreate, current_user: AuthenticatedUser = Depends(get_current_principal)):
     if current_user.role != "donor":
         raise HTTPException(status_code=403, detail="Only donors can create food items")
     
@@ -331,29 +814,34 @@ async def create_food_item(food_item: FoodItemCreate, current_user: User = Depen
     
     # Store in database
     food_data = prepare_for_mongo(food_obj.dict())
+    food_data["location"] = geo_point(food_obj.latitude, food_obj.longitude)
     await db.food_items.insert_one(food_data)
+    await user_stats.change(current_user.id, active_listings=1)
+    await schedule_expiry_check(food_obj.expiry_time)
+    await publish_food_item_event("created", food_obj.id, food_obj.donor_id, food_obj.status, food_data)
     
     return food_obj
 
-@api_router.get("/food-items")
+@api_router.get("/food-items", response_model=List[FoodItemWithRating])
 async def get_food_items(
+    request: Request,
+    response: Response,
     limit: int = 50,
+    cursor: Optional[str] = None,
     status: Optional[str] = None,
     food_type: Optional[str] = None,
-    current_user: User = Depends(get_current_user)
+    current_user: AuthenticatedUser = Depends(get_current_principal),
+    loaders: Loaders = Depends(get_loaders)
 ):
-    # Auto-expire items before returning results
-    await auto_expire_food_items()
-    
     query = {}
     
     # Recipients can only see available items, donors can see their own items
     if current_user.role == "recipient":
         query["status"] = "available"
-        # Only show items that haven't expired - this is now handled by auto_expire_food_items
-        # but we keep this as a safety check
+        # Expiry is applied by the background expiry task; filtering on expiry_time
+        # keeps items that are due but not yet marked out of the results
         current_time = datetime.now(timezone.utc)
-        query["expiry_time"] = {"$gt": current_time.isoformat()}
+        query["expiry_time"] = {"$gt": current_time}
     else:  # donor
         query["donor_id"] = current_user.id
     
@@ -362,51 +850,124 @@ async def get_food_items(
     if food_type:
         query["food_type"] = food_type
     
-    food_items = await db.food_items.find(query).limit(limit).to_list(length=None)
+    query = after_cursor(query, cursor, "created_at")
+    
+    # Answer a poll that has seen this version already without building the page. Recipients
+    # see every available listing with its donor's rating; donors see their own listings.
+    # (An item past its expiry drops out of the recipient list when the expiry task marks it.)
+    if current_user.role == "recipient":
+        versions = await view_versions.get(LISTINGS, "food_items", "ratings")
+    else:
+        versions = await view_versions.get(current_user.id, "food_items")
+    cached = not_modified(request, response, view_etag(request, current_user.id, *versions))
+    if cached:
+        return cached
+    
+    # Newest first, paged on (created_at, id)
+    limit = page_size(limit)
+    food_items = await db.food_items.find(query, model_projection(FoodItem)) \
+        .sort([("created_at", -1), ("id", -1)]).limit(limit + 1).to_list(length=None)
+    food_items = take_page(food_items, limit, response, "created_at")
     
     # For recipients, enhance food items with donor rating information
     if current_user.role == "recipient":
-        enhanced_items = []
-        for item in food_items:
-            enhanced_item = parse_from_mongo(item.copy())
-            
-            # Get donor information
-            donor = await db.users.find_one({"id": item["donor_id"]})
-            if donor:
-                enhanced_item["donor_name"] = donor.get("full_name", "Unknown Donor")
-                enhanced_item["donor_organization"] = donor.get("organization_name")
-            
-            # Get donor rating summary
-            ratings = await db.ratings.find({"donor_id": item["donor_id"]}).to_list(length=None)
-            if ratings:
-                total_ratings = len(ratings)
-                average_rating = sum(rating["rating"] for rating in ratings) / total_ratings
-                enhanced_item["donor_average_rating"] = round(average_rating, 1)
-                enhanced_item["donor_total_ratings"] = total_ratings
-            else:
-                enhanced_item["donor_average_rating"] = None
-                enhanced_item["donor_total_ratings"] = 0
-            
-            enhanced_items.append(FoodItemWithRating(**enhanced_item))
-        
-        return enhanced_items
+        return validated_json(List[FoodItemWithRating], await enrich_food_items_with_donor_info(food_items, loaders=loaders), response)
     else:
         # For donors, return regular food items
-        return [FoodItem(**parse_from_mongo(item)) for item in food_items]
+        return validated_json(List[FoodItem], food_items, response)
+
+@api_router.get("/food-items/nearby", response_model=List[FoodItemNearby])
+async def get_nearby_food_items(
+    lat: float,
+    lng: float,
+    radius_km: float = 10,
+    limit: int = 50,
+    food_type: Optional[str] = None,
+    current_user: AuthenticatedUser = Depends(get_current_principal),
+    loaders: Loaders = Depends(get_loaders)
+):
+    """Available, unexpired food items within radius_km of a point, nearest first"""
+    if current_user.role != "recipient":
+        raise HTTPException(status_code=403, detail="Only recipients can search nearby food items")
+    
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise HTTPException(status_code=400, detail="Invalid coordinates")
+    
+    if not (0 < radius_km <= MAX_NEARBY_RADIUS_KM):
+        raise HTTPException(status_code=400, detail=f"radius_km must be between 0 and {MAX_NEARBY_RADIUS_KM}")
+    
+    query = {
+        "status": "available",
+        "expiry_time": {"$gt": datetime.now(timezone.utc)}
+    }
+    if food_type:
+        query["food_type"] = food_type
+    
+    # $geoNear uses the 2dsphere index and returns results ordered by distance
+    food_items = await db.food_items.aggregate([
+        {"$geoNear": {
+            "near": geo_point(lat, lng),
+            "distanceField": "distance_m",
+            "maxDistance": radius_km * 1000,
+            "query": query,
+            "spherical": True
+        }},
+        {"$limit": page_size(limit)}
+    ]).to_list(length=None)
+    
+    for item in food_items:
+        item["distance_km"] = round(item.pop("distance_m") / 1000, 2)
+    
+    return await enrich_food_items_with_donor_info(food_items, loaders=loaders)
+
+@api_router.get("/food-items/stream")
+async def stream_food_items(request: Request, token: str = ""):
+    """Server-Sent Events feed of listing changes visible to the current user.
+
+    EventSource cannot send an Authorization header, so the JWT is passed as
+    the `token` query parameter. Clients load /food-items once and apply the
+    created/updated/claimed/expired/cancelled/deleted events as deltas.
+    """
+    current_user = await authenticate_token(token)
+    if current_user.role == "donor":
+        channel = donor_food_channel(current_user.id)
+    else:  # recipient
+        channel = FOOD_FEED_RECIPIENTS
+    queue = hub.subscribe(channel)
+    
+    async def event_stream():
+        try:
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            hub.unsubscribe(channel, queue)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @api_router.get("/food-items/{item_id}", response_model=FoodItem)
-async def get_food_item(item_id: str, current_user: User = Depends(get_current_user)):
+async def get_food_item(item_id: str, current_user: AuthenticatedUser = Depends(get_current_principal)):
     food_item = await db.food_items.find_one({"id": item_id})
     if not food_item:
         raise HTTPException(status_code=404, detail="Food item not found")
     
-    return FoodItem(**parse_from_mongo(food_item))
+    return FoodItem(**food_item)
 
 @api_router.put("/food-items/{item_id}", response_model=FoodItem)
 async def update_food_item(
     item_id: str, 
     food_update: FoodItemUpdate, 
-    current_user: User = Depends(get_current_user)
+    current_user: AuthenticatedUser = Depends(get_current_principal)
 ):
     food_item = await db.food_items.find_one({"id": item_id})
     if not food_item:
@@ -449,14 +1010,39 @@ async def update_food_item(
     
     update_data["updated_at"] = datetime.now(timezone.utc)
     
-    prepared_data = prepare_for_mongo(update_data)
-    await db.food_items.update_one({"id": item_id}, {"$set": prepared_data})
+    # The write only applies if the item is still in the state read above; a claim,
+    # expiry or other edit in between makes it a 409 instead of overwriting that change
+    expected = {"id": item_id, "donor_id": current_user.id, "status": food_item["status"]}
+    
+    # Keep the GeoJSON point in sync with the coordinates
+    if update_data.get("latitude") is not None or update_data.get("longitude") is not None:
+        for key in ("latitude", "longitude"):
+            if update_data.get(key) is None:
+                update_data[key] = expected[key] = food_item[key]
+        update_data["location"] = geo_point(update_data["latitude"], update_data["longitude"])
     
-    updated_item = await db.food_items.find_one({"id": item_id})
-    return FoodItem(**parse_from_mongo(updated_item))
+    prepared_data = prepare_for_mongo(update_data)
+    updated_doc = await db.food_items.find_one_and_update(
+        expected,
+        {"$set": prepared_data},
+        return_document=ReturnDocument.AFTER
+    )
+    if updated_doc is None:
+        raise HTTPException(status_code=409, detail="Food item changed while it was being edited; reload and try again")
+    
+    updated_item = FoodItem(**updated_doc)
+    # The filter pins the status before the write, so this delta matches what was stored
+    await user_stats.change(
+        current_user.id,
+        active_listings=(updated_doc["status"] == "available") - (expected["status"] == "available")
+    )
+    if updated_item.status == "available":
+        await schedule_expiry_check(updated_item.expiry_time)
+    await publish_food_item_event("updated", item_id, updated_item.donor_id, updated_item.status, updated_doc)
+    return updated_item
 
 @api_router.delete("/food-items/{item_id}")
-async def delete_food_item(item_id: str, current_user: User = Depends(get_current_user)):
+async def delete_food_item(item_id: str, current_user: AuthenticatedUser = Depends(get_current_principal)):
     food_item = await db.food_items.find_one({"id": item_id})
     if not food_item:
         raise HTTPException(status_code=404, detail="Food item not found")
@@ -472,50 +1058,42 @@ async def delete_food_item(item_id: str, current_user: User = Depends(get_curren
             raise HTTPException(status_code=400, detail="Cannot delete food item that has been claimed or sold")
     
     await db.food_items.delete_one({"id": item_id})
+    if food_item["status"] == "available":
+        await user_stats.change(current_user.id, active_listings=-1)
+    await publish_food_item_event("deleted", item_id, food_item["donor_id"], "deleted")
     return {"message": "Food item deleted successfully"}
 
 # Order/Claim Routes
 @api_router.post("/orders", response_model=Order)
-async def create_order(order_create: OrderCreate, current_user: User = Depends(get_current_user)):
+async def create_order(order_create: OrderCreate, current_user: AuthenticatedUser = Depends(get_current_principal)):
     if current_user.role != "recipient":
         raise HTTPException(status_code=403, detail="Only recipients can create orders")
     
-    # Get food item
-    food_item = await db.food_items.find_one({"id": order_create.food_item_id})
-    if not food_item:
-        raise HTTPException(status_code=404, detail="Food item not found")
-    
-    if food_item["status"] != "available":
-        raise HTTPException(status_code=400, detail="Food item is not available")
-    
-    # Create order
-    order_dict = order_create.dict()
-    order_dict["recipient_id"] = current_user.id
-    order_dict["donor_id"] = food_item["donor_id"]
-    
-    if food_item["food_type"] == "donation":
-        order_dict["order_type"] = "claim"
-        order_dict["total_amount"] = 0.0
-        order_dict["payment_status"] = "completed"
-    else:  # sale
-        order_dict["order_type"] = "purchase"
-        order_dict["total_amount"] = food_item.get("price", 0.0)
-        order_dict["payment_status"] = "pending"
-    
-    order_obj = Order(**order_dict)
+    def make_order(food_item):
+        order_dict = order_create.dict()
+        order_dict["recipient_id"] = current_user.id
+        order_dict["donor_id"] = food_item["donor_id"]
+        order_dict["food_title"] = food_item.get("title")
+        order_dict["food_quantity"] = food_item.get("quantity")
+        order_dict["pickup_address"] = food_item.get("pickup_address")
+        
+        if food_item["food_type"] == "donation":
+            order_dict["order_type"] = "claim"
+            order_dict["total_amount"] = 0.0
+            order_dict["payment_status"] = "completed"
+        else:  # sale
+            order_dict["order_type"] = "purchase"
+            order_dict["total_amount"] = food_item.get("price", 0.0)
+            order_dict["payment_status"] = "pending"
+        
+        return prepare_for_mongo(Order(**order_dict).dict())
     
-    # Store in database
-    order_data = prepare_for_mongo(order_obj.dict())
-    await db.orders.insert_one(order_data)
-    
-    # Update food item status
-    new_status = "claimed" if food_item["food_type"] == "donation" else "sold"
-    await db.food_items.update_one(
-        {"id": order_create.food_item_id},
-        {"$set": {"status": new_status, "updated_at": datetime.now(timezone.utc).isoformat()}}
-    )
+    # Take the item and record the order atomically - only one concurrent claim can win
+    order_data, food_item = await order_states.claim_food_item(order_create.food_item_id, make_order)
+    await orders_changed(order_data)
+    await publish_food_item_event("claimed", food_item["id"], food_item["donor_id"], food_item["status"])
     
-    return order_obj
+    return Order(**order_data)
 
 class OrderWithDetails(BaseModel):
     id: str
@@ -543,139 +1121,85 @@ class OrderWithDetails(BaseModel):
     recipient_address: Optional[str] = None
 
 @api_router.get("/orders", response_model=List[OrderWithDetails])
-async def get_orders(current_user: User = Depends(get_current_user)):
+async def get_orders(
+    request: Request,
+    response: Response,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    current_user: AuthenticatedUser = Depends(get_current_principal),
+    loaders: Loaders = Depends(get_loaders)
+):
     if current_user.role == "recipient":
         query = {"recipient_id": current_user.id}
     else:  # donor
         query = {"donor_id": current_user.id}
     
-    orders = await db.orders.find(query).sort("created_at", -1).to_list(length=None)
-    enriched_orders = []
+    query = after_cursor(query, cursor, "created_at")
+    cached = not_modified(request, response, view_etag(request, current_user.id, *await view_versions.get(current_user.id, "orders")))
+    if cached:
+        return cached
+    
+    limit = page_size(limit)
+    orders = await db.orders.find(query, model_projection(Order)) \
+        .sort([("created_at", -1), ("id", -1)]).limit(limit + 1).to_list(length=None)
+    orders = take_page(orders, limit, response, "created_at")
+    
+    # Food details are snapshotted on the order; only older orders need a lookup. The counterpart
+    # profiles for the whole page are loaded alongside, one query each
+    counterpart_field = "donor_id" if current_user.role == "recipient" else "recipient_id"
+    _, counterparts = await asyncio.gather(
+        attach_food_details(orders, loaders),
+        loaders.users.load_many(order[counterpart_field] for order in orders),
+    )
     
-    for order in orders:
-        order_data = parse_from_mongo(order)
-        
-        # Get food item details
-        food_item = await db.food_items.find_one({"id": order["food_item_id"]})
-        if food_item:
-            order_data["food_title"] = food_item.get("title")
-            order_data["food_quantity"] = food_item.get("quantity")
-            order_data["pickup_address"] = food_item.get("pickup_address")
+    enriched_orders = []
+    for order, counterpart in zip(orders, counterparts):
+        order_data = order
         
         # Get donor details for recipients
-        if current_user.role == "recipient":
-            donor = await db.users.find_one({"id": order["donor_id"]})
-            if donor:
-                order_data["donor_name"] = donor.get("full_name")
-                order_data["donor_organization"] = donor.get("organization_name")
+        if current_user.role == "recipient" and counterpart:
+            order_data["donor_name"] = counterpart.get("full_name")
+            order_data["donor_organization"] = counterpart.get("organization_name")
         
         # Get recipient details for donors (tracking functionality)
-        if current_user.role == "donor":
-            recipient = await db.users.find_one({"id": order["recipient_id"]})
-            if recipient:
-                order_data["recipient_name"] = recipient.get("full_name")
-                order_data["recipient_organization"] = recipient.get("organization_name")
-                order_data["recipient_phone"] = recipient.get("phone")
-                order_data["recipient_address"] = recipient.get("address")
+        if current_user.role == "donor" and counterpart:
+            order_data["recipient_name"] = counterpart.get("full_name")
+            order_data["recipient_organization"] = counterpart.get("organization_name")
+            order_data["recipient_phone"] = counterpart.get("phone")
+            order_data["recipient_address"] = counterpart.get("address")
         
-        enriched_orders.append(OrderWithDetails(**order_data))
+        enriched_orders.append(order_data)
     
-    return enriched_orders
+    return validated_json(List[OrderWithDetails], enriched_orders, response)
 
 # Mock Payment Route
 @api_router.post("/orders/{order_id}/pay")
-async def process_payment(order_id: str, current_user: User = Depends(get_current_user)):
-    order = await db.orders.find_one({"id": order_id})
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
-    
-    if order["recipient_id"] != current_user.id:
-        raise HTTPException(status_code=403, detail="You can only pay for your own orders")
-    
-    if order["payment_status"] == "completed":
-        raise HTTPException(status_code=400, detail="Order already paid")
-    
+async def process_payment(order_id: str, current_user: AuthenticatedUser = Depends(get_current_principal)):
     # Mock payment processing - always succeeds
-    await db.orders.update_one(
-        {"id": order_id},
-        {"$set": {
-            "payment_status": "completed",
-            "status": "confirmed",
-            "updated_at": datetime.now(timezone.utc).isoformat()
-        }}
-    )
+    order = await order_states.pay(order_id, current_user.id)
+    await orders_changed(order)
     
     return {"message": "Payment processed successfully", "order_id": order_id}
 
 # Order Confirmation Route - Recipients confirm pickup/completion
 @api_router.post("/orders/{order_id}/confirm")
-async def confirm_order_pickup(order_id: str, current_user: User = Depends(get_current_user)):
+async def confirm_order_pickup(order_id: str, current_user: AuthenticatedUser = Depends(get_current_principal)):
     """Recipients confirm that they have picked up/received the food"""
-    order = await db.orders.find_one({"id": order_id})
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
-    
-    if order["recipient_id"] != current_user.id:
-        raise HTTPException(status_code=403, detail="You can only confirm your own orders")
-    
-    # Check if order is in a state that can be confirmed
-    if order["status"] not in ["confirmed", "pending"]:
-        raise HTTPException(status_code=400, detail=f"Order cannot be confirmed. Current status: {order['status']}")
-    
-    # For purchase orders, payment must be completed first
-    if order["order_type"] == "purchase" and order["payment_status"] != "completed":
-        raise HTTPException(status_code=400, detail="Payment must be completed before confirming pickup")
-    
-    # Update order to completed status
-    await db.orders.update_one(
-        {"id": order_id},
-        {"$set": {
-            "status": "completed",
-            "updated_at": datetime.now(timezone.utc).isoformat()
-        }}
-    )
+    order = await order_states.confirm_pickup(order_id, current_user.id)
+    await orders_changed(order)
     
     return {"message": "Order confirmed successfully. Food pickup completed!", "order_id": order_id}
 
 # Order Cancellation Route - Recipients can cancel their orders
 @api_router.post("/orders/{order_id}/cancel")
-async def cancel_order(order_id: str, current_user: User = Depends(get_current_user)):
+async def cancel_order(order_id: str, current_user: AuthenticatedUser = Depends(get_current_principal)):
     """Recipients can cancel their orders before payment (for purchases) or anytime (for donations)"""
-    order = await db.orders.find_one({"id": order_id})
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
-    
-    if order["recipient_id"] != current_user.id:
-        raise HTTPException(status_code=403, detail="You can only cancel your own orders")
-    
-    # Check if order can be cancelled
-    if order["status"] == "completed":
-        raise HTTPException(status_code=400, detail="Cannot cancel completed orders")
-    
-    if order["status"] == "cancelled":
-        raise HTTPException(status_code=400, detail="Order is already cancelled")
-    
-    # For purchase orders, can only cancel if payment is not completed
-    if order["order_type"] == "purchase" and order["payment_status"] == "completed":
-        raise HTTPException(status_code=400, detail="Cannot cancel paid orders")
-    
-    # Update order status to cancelled
-    await db.orders.update_one(
-        {"id": order_id},
-        {"$set": {
-            "status": "cancelled",
-            "updated_at": datetime.now(timezone.utc).isoformat()
-        }}
-    )
-    
-    # Update food item status back to available
-    await db.food_items.update_one(
-        {"id": order["food_item_id"]},
-        {"$set": {
-            "status": "available",
-            "updated_at": datetime.now(timezone.utc).isoformat()
-        }}
-    )
+    # Cancel the order and put the food item back on offer
+    order, food_item = await order_states.cancel(order_id, current_user.id)
+    await orders_changed(order)
+    if food_item:
+        await schedule_expiry_check(food_item["expiry_time"])
+        await publish_food_item_event("cancelled", food_item["id"], food_item["donor_id"], "available", food_item)
     
     return {"message": "Order cancelled successfully", "order_id": order_id}
 
@@ -694,6 +1218,49 @@ class RecipientTrackingInfo(BaseModel):
     first_order_date: datetime
     last_order_date: datetime
 
+RECIPIENT_PROFILE_PROJECTION = {"_id": 0, "full_name": 1, "organization_name": 1, "phone": 1, "address": 1}
+
+def recipient_totals_group(group_id, recent_orders: int = 0):
+    """$group stage for a donor's per-recipient totals - ONLY completed orders count towards claims, purchases and spend"""
+    completed = {"$eq": ["$status", "completed"]}
+    group = {
+        "_id": group_id,
+        "total_orders": {"$sum": 1},
+        "total_claims": {"$sum": {"$cond": [{"$and": [completed, {"$eq": ["$order_type", "claim"]}]}, 1, 0]}},
+        "total_purchases": {"$sum": {"$cond": [{"$and": [completed, {"$eq": ["$order_type", "purchase"]}]}, 1, 0]}},
+        # Only count completed purchases with completed payments
+        "total_spent": {"$sum": {"$cond": [
+            {"$and": [completed, {"$eq": ["$order_type", "purchase"]}, {"$eq": ["$payment_status", "completed"]}]},
+            "$total_amount",
+            0
+        ]}},
+        "first_order_date": {"$min": "$created_at"},
+        "last_order_date": {"$max": "$created_at"}
+    }
+    if recent_orders:
+        group["recent_orders"] = {"$topN": {
+            "n": recent_orders,
+            "sortBy": {"created_at": -1, "id": -1},
+            "output": "$$ROOT"
+        }}
+    return group
+
+def recipient_tracking_info(totals: dict, recipient: dict, orders: list) -> RecipientTrackingInfo:
+    return RecipientTrackingInfo(
+        recipient_id=totals["recipient_id"],
+        recipient_name=recipient.get("full_name", "Unknown"),
+        recipient_organization=recipient.get("organization_name"),
+        recipient_phone=recipient.get("phone"),
+        recipient_address=recipient.get("address"),
+        total_claims=totals["total_claims"],
+        total_purchases=totals["total_purchases"],
+        total_spent=totals["total_spent"],
+        total_orders=totals["total_orders"],  # Total number of orders
+        recent_orders=orders,
+        first_order_date=totals["first_order_date"],
+        last_order_date=totals["last_order_date"]
+    )
+
 # Rating Models
 class Rating(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid4()))
@@ -724,97 +1291,60 @@ class DonorRatingSummary(BaseModel):
     all_ratings: List[Rating]  # All ratings, not just recent
 
 @api_router.get("/donors/recipients", response_model=List[RecipientTrackingInfo])
-async def get_recipient_tracking(current_user: User = Depends(get_current_user)):
+async def get_recipient_tracking(
+    response: Response,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    current_user: AuthenticatedUser = Depends(get_current_principal),
+    loaders: Loaders = Depends(get_loaders)
+):
     """Get all recipients who have COMPLETED claims/purchases from this donor with tracking info"""
     if current_user.role != "donor":
         raise HTTPException(status_code=403, detail="Only donors can access recipient tracking")
     
-    # Get all orders for this donor
-    orders = await db.orders.find({"donor_id": current_user.id}).to_list(length=None)
+    # Totals, dates and the five most recent orders per recipient are computed in
+    # the database; only one page of recipients comes back, most recent first
+    limit = page_size(limit)
+    pipeline = [
+        {"$match": {"donor_id": current_user.id}},
+        {"$group": recipient_totals_group("$recipient_id", recent_orders=5)},
+    ]
+    keyset = after_cursor({}, cursor, "last_order_date", id_field="_id")
+    if keyset:
+        pipeline.append({"$match": keyset})
+    pipeline += [
+        {"$sort": {"last_order_date": -1, "_id": -1}},
+        {"$limit": limit + 1},
+        {"$set": {"recipient_id": "$_id"}},
+        {"$lookup": {
+            "from": "users",
+            "localField": "recipient_id",
+            "foreignField": "id",
+            "pipeline": [{"$project": RECIPIENT_PROFILE_PROJECTION}],
+            "as": "recipient"
+        }}
+    ]
+    groups = await db.orders.aggregate(pipeline).to_list(length=None)
+    page = take_page(groups, limit, response, "last_order_date", id_field="recipient_id")
     
-    # Group orders by recipient
-    recipients_data = {}
+    # Food details for orders that predate snapshots, one query for the whole page
+    await attach_food_details([order for data in page for order in data["recent_orders"]], loaders)
     
-    for order in orders:
-        recipient_id = order["recipient_id"]
-        if recipient_id not in recipients_data:
-            # Get recipient details
-            recipient = await db.users.find_one({"id": recipient_id})
-            if not recipient:
-                continue  # Skip if recipient not found
-            
-            recipients_data[recipient_id] = {
-                "recipient": recipient,
-                "orders": [],
-                "total_claims": 0,
-                "total_purchases": 0,
-                "total_spent": 0
-            }
-        
-        recipients_data[recipient_id]["orders"].append(order)
-        
-        # Count claims vs purchases and calculate totals - ONLY for completed orders
-        if order["status"] == "completed":  # Only count completed orders
-            if order["order_type"] == "claim":
-                recipients_data[recipient_id]["total_claims"] += 1
-            else:  # purchase
-                recipients_data[recipient_id]["total_purchases"] += 1
-                # Only add to total_spent if payment is also completed
-                if order.get("payment_status") == "completed":
-                    recipients_data[recipient_id]["total_spent"] += order.get("total_amount", 0)
-    
-    # Build response
     tracking_info = []
-    for recipient_id, data in recipients_data.items():
-        recipient = data["recipient"]
-        orders_list = data["orders"]
-        
-        # Get recent orders (last 5)
-        recent_orders_data = sorted(orders_list, key=lambda x: x["created_at"], reverse=True)[:5]
-        recent_orders = []
-        
-        for order in recent_orders_data:
-            order_data = parse_from_mongo(order.copy())
-            
-            # Get food item details
-            food_item = await db.food_items.find_one({"id": order["food_item_id"]})
-            if food_item:
-                order_data["food_title"] = food_item.get("title")
-                order_data["food_quantity"] = food_item.get("quantity")
-                order_data["pickup_address"] = food_item.get("pickup_address")
-            
-            recent_orders.append(OrderWithDetails(**order_data))
-        
-        # Calculate dates
-        order_dates = [parse_from_mongo({"date": order["created_at"]})["date"] for order in orders_list]
-        
-        # Handle edge case where orders_list might be empty
-        if not order_dates:
-            continue
-            
-        tracking_info.append(RecipientTrackingInfo(
-            recipient_id=recipient_id,
-            recipient_name=recipient.get("full_name", "Unknown"),
-            recipient_organization=recipient.get("organization_name"),
-            recipient_phone=recipient.get("phone"),
-            recipient_address=recipient.get("address"),
-            total_claims=data["total_claims"],
-            total_purchases=data["total_purchases"],
-            total_spent=data["total_spent"],
-            total_orders=len(orders_list),  # Total number of orders
-            recent_orders=recent_orders,
-            first_order_date=min(order_dates),
-            last_order_date=max(order_dates)
-        ))
-    
-    # Sort by last order date (most recent first)
-    tracking_info.sort(key=lambda x: x.last_order_date, reverse=True)
+    for data in page:
+        if not data["recipient"]:
+            continue  # Skip if recipient not found
+        tracking_info.append(recipient_tracking_info(data, data["recipient"][0], data["recent_orders"]))
     
-    return tracking_info
+    return validated_json(List[RecipientTrackingInfo], tracking_info, response)
 
 # Rating Routes
 @api_router.post("/ratings", response_model=Rating)
-async def create_rating(rating_create: RatingCreate, current_user: User = Depends(get_current_user)):
+async def create_rating(
+    rating_create: RatingCreate,
+    current_user: AuthenticatedUser = Depends(get_current_principal),
+    loaders: Loaders = Depends(get_loaders)
+):
     """Recipients can create ratings for completed orders"""
     if current_user.role != "recipient":
         raise HTTPException(status_code=403, detail="Only recipients can create ratings")
@@ -837,9 +1367,9 @@ async def create_rating(rating_create: RatingCreate, current_user: User = Depend
     if existing_rating:
         raise HTTPException(status_code=400, detail="This order has already been rated")
     
-    # Get food item details for reference
-    food_item = await db.food_items.find_one({"id": order["food_item_id"]})
-    food_title = food_item.get("title", "Food Item") if food_item else "Food Item"
+    # Food title for reference, from the order's snapshot when it has one
+    await attach_food_details([order], loaders)
+    food_title = order.get("food_title") or "Food Item"
     
     # Create rating
     rating_dict = rating_create.dict()
@@ -852,16 +1382,18 @@ async def create_rating(rating_create: RatingCreate, current_user: User = Depend
     # Store in database
     rating_data = prepare_for_mongo(rating_obj.dict())
     await db.ratings.insert_one(rating_data)
+    await record_rating_change(rating_obj.donor_id, rating_obj.rating)
     
     return rating_obj
 
 @api_router.get("/ratings", response_model=List[Rating])
 async def get_ratings(
+    response: Response,
     donor_id: Optional[str] = None,
     recipient_id: Optional[str] = None,
     order_id: Optional[str] = None,
     limit: int = 50,
-    current_user: User = Depends(get_current_user)
+    current_user: AuthenticatedUser = Depends(get_current_principal)
 ):
     """Get ratings with optional filters"""
     query = {}
@@ -880,11 +1412,11 @@ async def get_ratings(
     if order_id:
         query["order_id"] = order_id
     
-    ratings = await db.ratings.find(query).limit(limit).sort("created_at", -1).to_list(length=None)
-    return [Rating(**parse_from_mongo(rating)) for rating in ratings]
+    ratings = await db.ratings.find(query, model_projection(Rating)).limit(limit).sort("created_at", -1).to_list(length=None)
+    return validated_json(List[Rating], ratings, response)
 
 @api_router.get("/ratings/{rating_id}", response_model=Rating)
-async def get_rating(rating_id: str, current_user: User = Depends(get_current_user)):
+async def get_rating(rating_id: str, current_user: AuthenticatedUser = Depends(get_current_principal)):
     """Get a specific rating"""
     rating = await db.ratings.find_one({"id": rating_id})
     if not rating:
@@ -895,13 +1427,13 @@ async def get_rating(rating_id: str, current_user: User = Depends(get_current_us
        (current_user.role == "recipient" and rating["recipient_id"] != current_user.id):
         raise HTTPException(status_code=403, detail="You don't have access to this rating")
     
-    return Rating(**parse_from_mongo(rating))
+    return Rating(**rating)
 
 @api_router.put("/ratings/{rating_id}", response_model=Rating)
 async def update_rating(
     rating_id: str, 
     rating_update: RatingUpdate, 
-    current_user: User = Depends(get_current_user)
+    current_user: AuthenticatedUser = Depends(get_current_principal)
 ):
     """Recipients can update their ratings"""
     if current_user.role != "recipient":
@@ -920,184 +1452,187 @@ async def update_rating(
     
     prepared_data = prepare_for_mongo(update_dict)
     await db.ratings.update_one({"id": rating_id}, {"$set": prepared_data})
+    if update_dict.get("rating") is not None:
+        await record_rating_change(rating["donor_id"], update_dict["rating"], old_rating=rating["rating"])
     
     updated_rating = await db.ratings.find_one({"id": rating_id})
-    return Rating(**parse_from_mongo(updated_rating))
+    return Rating(**updated_rating)
 
 @api_router.get("/donors/{donor_id}/rating-summary", response_model=DonorRatingSummary)
-async def get_donor_rating_summary(donor_id: str, current_user: User = Depends(get_current_user)):
+async def get_donor_rating_summary(
+    donor_id: str,
+    response: Response,
+    current_user: AuthenticatedUser = Depends(get_current_principal),
+    loaders: Loaders = Depends(get_loaders)
+):
     """Get rating summary for a donor"""
-    # Get all ratings for this donor
-    ratings = await db.ratings.find({"donor_id": donor_id}).to_list(length=None)
+    # Count, average and distribution come from the maintained aggregate
+    stats = await db.donor_rating_stats.find_one({"donor_id": donor_id})
     
-    if not ratings:
+    if not stats or not stats.get("count"):
         return DonorRatingSummary(
             donor_id=donor_id,
             average_rating=0.0,
             total_ratings=0,
-            rating_distribution={"5": 0, "4": 0, "3": 0, "2": 0, "1": 0},
+            rating_distribution=empty_rating_distribution(),
             all_ratings=[]
         )
     
-    # Calculate statistics
-    total_ratings = len(ratings)
-    average_rating = sum(rating["rating"] for rating in ratings) / total_ratings
-    
-    # Calculate distribution
-    distribution = {"5": 0, "4": 0, "3": 0, "2": 0, "1": 0}
-    for rating in ratings:
-        distribution[str(rating["rating"])] += 1
+    total_ratings = stats["count"]
+    average_rating = stats["sum"] / total_ratings
+    distribution = {**empty_rating_distribution(), **stats.get("distribution", {})}
     
     # Get all ratings (sorted by most recent first) and enhance with recipient info
-    all_ratings_data = sorted(ratings, key=lambda x: x["created_at"], reverse=True)
+    all_ratings_data = await db.ratings.find({"donor_id": donor_id}, model_projection(Rating)).sort("created_at", -1).to_list(length=None)
+    # Recipient profiles for every rating in one query
+    recipients = await loaders.users.load_many(rating_data["recipient_id"] for rating_data in all_ratings_data)
     all_ratings = []
     
-    for rating_data in all_ratings_data:
-        rating_dict = parse_from_mongo(rating_data)
+    for rating_data, recipient in zip(all_ratings_data, recipients):
+        rating_dict = rating_data
         
-        # Get recipient information
-        recipient = await db.users.find_one({"id": rating_data["recipient_id"]})
         if recipient:
             rating_dict["recipient_name"] = recipient.get("full_name", "Anonymous")
         else:
             rating_dict["recipient_name"] = "Anonymous"
         
-        all_ratings.append(Rating(**rating_dict))
+        all_ratings.append(rating_dict)
     
-    return DonorRatingSummary(
+    return validated_json(DonorRatingSummary, DonorRatingSummary(
         donor_id=donor_id,
         average_rating=round(average_rating, 1),
         total_ratings=total_ratings,
         rating_distribution=distribution,
         all_ratings=all_ratings
-    )
+    ), response)
 
 @api_router.get("/donors/recipients/{recipient_id}", response_model=RecipientTrackingInfo)
-async def get_recipient_details(recipient_id: str, current_user: User = Depends(get_current_user)):
+async def get_recipient_details(
+    recipient_id: str,
+    response: Response,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    current_user: AuthenticatedUser = Depends(get_current_principal),
+    loaders: Loaders = Depends(get_loaders)
+):
     """Get detailed tracking info for a specific recipient"""
     if current_user.role != "donor":
         raise HTTPException(status_code=403, detail="Only donors can access recipient tracking")
     
-    # Verify the recipient has orders with this donor
-    orders = await db.orders.find({
-        "donor_id": current_user.id,
-        "recipient_id": recipient_id
-    }).to_list(length=None)
+    # Totals over the full history, one page of orders and the recipient profile
+    # in a single round trip
+    limit = page_size(limit)
+    order_page = [{"$sort": {"created_at": -1, "id": -1}}, {"$limit": limit + 1}]
+    keyset = after_cursor({}, cursor, "created_at")
+    if keyset:
+        order_page.insert(0, {"$match": keyset})
+    result = await db.orders.aggregate([
+        {"$match": {"donor_id": current_user.id, "recipient_id": recipient_id}},
+        {"$facet": {
+            "summary": [{"$group": recipient_totals_group(None)}],
+            "orders": order_page
+        }},
+        {"$lookup": {
+            "from": "users",
+            "pipeline": [{"$match": {"id": recipient_id}}, {"$project": RECIPIENT_PROFILE_PROJECTION}],
+            "as": "recipient"
+        }}
+    ]).to_list(1)
+    result = result[0]
     
-    if not orders:
+    # Verify the recipient has orders with this donor
+    if not result["summary"]:
         raise HTTPException(status_code=404, detail="No orders found for this recipient")
-    
-    # Get recipient details
-    recipient = await db.users.find_one({"id": recipient_id})
-    if not recipient:
+    if not result["recipient"]:
         raise HTTPException(status_code=404, detail="Recipient not found")
     
-    # Process all orders - ONLY count completed orders
-    total_claims = sum(1 for order in orders 
-                      if order["order_type"] == "claim" and order["status"] == "completed")
-    total_purchases = sum(1 for order in orders 
-                         if order["order_type"] == "purchase" and order["status"] == "completed")
-    # Only count completed purchases with completed payments
-    total_spent = sum(
-        order.get("total_amount", 0) 
-        for order in orders 
-        if (order["order_type"] == "purchase" and 
-            order["status"] == "completed" and 
-            order.get("payment_status") == "completed")
-    )
+    orders = take_page(result["orders"], limit, response, "created_at")
+    await attach_food_details(orders, loaders)
     
-    # Get all orders with details
-    detailed_orders = []
-    for order in orders:
-        order_data = parse_from_mongo(order.copy())
-        
-        # Get food item details
-        food_item = await db.food_items.find_one({"id": order["food_item_id"]})
-        if food_item:
-            order_data["food_title"] = food_item.get("title")
-            order_data["food_quantity"] = food_item.get("quantity")
-            order_data["pickup_address"] = food_item.get("pickup_address")
-        
-        detailed_orders.append(OrderWithDetails(**order_data))
-    
-    # Sort orders by date (most recent first)
-    detailed_orders.sort(key=lambda x: x.created_at, reverse=True)
-    
-    # Calculate dates
-    order_dates = [parse_from_mongo({"date": order["created_at"]})["date"] for order in orders]
-    
-    return RecipientTrackingInfo(
-        recipient_id=recipient_id,
-        recipient_name=recipient.get("full_name", "Unknown"),
-        recipient_organization=recipient.get("organization_name"),
-        recipient_phone=recipient.get("phone"),
-        recipient_address=recipient.get("address"),
-        total_claims=total_claims,
-        total_purchases=total_purchases,
-        total_spent=total_spent,
-        total_orders=len(orders),  # Total number of orders
-        recent_orders=detailed_orders,  # Return all orders, not just recent
-        first_order_date=min(order_dates),
-        last_order_date=max(order_dates)
-    )
+    summary = result["summary"][0]
+    summary["recipient_id"] = recipient_id
+    # recent_orders holds one page of the full order history
+    return validated_json(RecipientTrackingInfo, recipient_tracking_info(summary, result["recipient"][0], orders), response)
 
 # Chat Routes
 @api_router.get("/chat/contacts", response_model=List[ChatContact])
-async def get_chat_contacts(current_user: User = Depends(get_current_user)):
+async def get_chat_contacts(
+    request: Request,
+    response: Response,
+    current_user: AuthenticatedUser = Depends(get_current_principal)
+):
     """Get all users this user can chat with (based on completed orders)"""
     
     # Find all orders involving this user (allow chat after any order is created)
     if current_user.role == "donor":
-        orders = await db.orders.find({
-            "donor_id": current_user.id,
-            "status": {"$in": ["pending", "confirmed", "completed"]}
-        }).to_list(length=None)
-        contact_ids = list(set(order["recipient_id"] for order in orders))
+        own_field, contact_field = "donor_id", "recipient_id"
     else:  # recipient
-        orders = await db.orders.find({
-            "recipient_id": current_user.id,
+        own_field, contact_field = "recipient_id", "donor_id"
+    
+    # The list changes with this user's orders, messages and read receipts
+    etag = view_etag(request, current_user.id, *await view_versions.get(current_user.id, "orders", "messages"))
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
+    
+    # Distinct counterparts joined with their profiles in one pipeline
+    contact_users = await db.orders.aggregate([
+        {"$match": {
+            own_field: current_user.id,
             "status": {"$in": ["pending", "confirmed", "completed"]}
-        }).to_list(length=None)
-        contact_ids = list(set(order["donor_id"] for order in orders))
+        }},
+        {"$group": {"_id": f"${contact_field}"}},
+        {"$lookup": {
+            "from": "users",
+            "localField": "_id",
+            "foreignField": "id",
+            "as": "user"
+        }},
+        {"$unwind": "$user"},
+        {"$project": {
+            "full_name": "$user.full_name",
+            "organization_name": "$user.organization_name",
+            "role": "$user.role"
+        }}
+    ]).to_list(length=None)
     
-    if not contact_ids:
+    if not contact_users:
         return []
     
-    # Get contact user details
+    contact_ids = [contact_user["_id"] for contact_user in contact_users]
+    
+    # Last message and unread count per counterpart in one pipeline
+    conversations = await db.messages.aggregate([
+        {"$match": {"$or": [
+            {"sender_id": current_user.id, "receiver_id": {"$in": contact_ids}},
+            {"sender_id": {"$in": contact_ids}, "receiver_id": current_user.id}
+        ]}},
+        {"$sort": {"timestamp": -1}},
+        {"$group": {
+            "_id": {"$cond": [{"$eq": ["$sender_id", current_user.id]}, "$receiver_id", "$sender_id"]},
+            "last_message": {"$first": "$content"},
+            "last_message_time": {"$first": "$timestamp"},
+            "unread_count": {"$sum": {"$cond": [
+                {"$and": [{"$eq": ["$receiver_id", current_user.id]}, {"$eq": ["$is_read", False]}]},
+                1,
+                0
+            ]}}
+        }}
+    ]).to_list(length=None)
+    conversations_by_contact = {conversation["_id"]: conversation for conversation in conversations}
+    
     contacts = []
-    for contact_id in contact_ids:
-        contact_user = await db.users.find_one({"id": contact_id})
-        if not contact_user:
-            continue
-        
-        # Get last message between users
-        last_message_doc = await db.messages.find_one(
-            {
-                "$or": [
-                    {"sender_id": current_user.id, "receiver_id": contact_id},
-                    {"sender_id": contact_id, "receiver_id": current_user.id}
-                ]
-            },
-            sort=[("timestamp", -1)]
-        )
-        
-        # Count unread messages from this contact
-        unread_count = await db.messages.count_documents({
-            "sender_id": contact_id,
-            "receiver_id": current_user.id,
-            "is_read": False
-        })
-        
-        contact = ChatContact(
-            user_id=contact_id,
+    for contact_user in contact_users:
+        conversation = conversations_by_contact.get(contact_user["_id"], {})
+        contacts.append(ChatContact(
+            user_id=contact_user["_id"],
             user_name=contact_user.get("full_name", "Unknown"),
             user_organization=contact_user.get("organization_name"),
             user_role=contact_user.get("role"),
-            last_message=last_message_doc.get("content") if last_message_doc else None,
-            last_message_time=parse_from_mongo({"timestamp": last_message_doc["timestamp"]})["timestamp"] if last_message_doc else None,
-            unread_count=unread_count
-        )
-        contacts.append(contact)
+            last_message=conversation.get("last_message"),
+            last_message_time=conversation.get("last_message_time"),
+            unread_count=conversation.get("unread_count", 0)
+        ))
     
     # Sort by last message time (most recent first)
     contacts.sort(key=lambda x: x.last_message_time or datetime.min.replace(tzinfo=timezone.utc), reverse=True)
@@ -1105,8 +1640,15 @@ async def get_chat_contacts(current_user: User = Depends(get_current_user)):
     return contacts
 
 @api_router.get("/chat/{contact_id}", response_model=ChatConversation)
-async def get_chat_conversation(contact_id: str, current_user: User = Depends(get_current_user)):
-    """Get conversation with a specific contact"""
+async def get_chat_conversation(
+    contact_id: str,
+    response: Response,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    current_user: AuthenticatedUser = Depends(get_current_principal),
+    loaders: Loaders = Depends(get_loaders)
+):
+    """Get conversation with a specific contact; the cursor pages back to older messages"""
     
     # Verify the users can chat (have any orders together)
     if current_user.role == "donor":
@@ -1126,30 +1668,25 @@ async def get_chat_conversation(contact_id: str, current_user: User = Depends(ge
         raise HTTPException(status_code=403, detail="You can only chat with users you have orders with")
     
     # Get contact user details
-    contact_user = await db.users.find_one({"id": contact_id})
+    contact_user = await loaders.users.load(contact_id)
     if not contact_user:
         raise HTTPException(status_code=404, detail="Contact not found")
     
-    # Get messages between users
-    messages = await db.messages.find({
+    # Get the newest page of messages between users, then return it oldest first
+    limit = page_size(limit)
+    conversation_query = {
         "$or": [
             {"sender_id": current_user.id, "receiver_id": contact_id},
             {"sender_id": contact_id, "receiver_id": current_user.id}
         ]
-    }).sort("timestamp", 1).to_list(length=None)
+    }
+    messages = await db.messages.find(after_cursor(conversation_query, cursor, "timestamp"), model_projection(Message)) \
+        .sort([("timestamp", -1), ("id", -1)]).limit(limit + 1).to_list(length=None)
+    messages = take_page(messages, limit, response, "timestamp")
+    messages.reverse()
     
     # Mark messages from contact as read
-    await db.messages.update_many(
-        {
-            "sender_id": contact_id,
-            "receiver_id": current_user.id,
-            "is_read": False
-        },
-        {"$set": {"is_read": True}}
-    )
-    
-    # Parse messages
-    parsed_messages = [Message(**parse_from_mongo(msg)) for msg in messages]
+    await mark_conversation_read(current_user.id, contact_id)
     
     contact = ChatContact(
         user_id=contact_id,
@@ -1159,10 +1696,14 @@ async def get_chat_conversation(contact_id: str, current_user: User = Depends(ge
         unread_count=0  # Now 0 since we marked as read
     )
     
-    return ChatConversation(contact=contact, messages=parsed_messages)
+    return validated_json(ChatConversation, ChatConversation(contact=contact, messages=messages), response)
 
 @api_router.post("/chat/send", response_model=Message)
-async def send_message(message_data: MessageCreate, current_user: User = Depends(get_current_user)):
+async def send_message(
+    message_data: MessageCreate,
+    current_user: AuthenticatedUser = Depends(get_current_principal),
+    loaders: Loaders = Depends(get_loaders)
+):
     """Send a message to another user"""
     
     # Verify the users can chat (have any orders together)
@@ -1183,7 +1724,7 @@ async def send_message(message_data: MessageCreate, current_user: User = Depends
         raise HTTPException(status_code=403, detail="You can only chat with users you have orders with")
     
     # Verify receiver exists
-    receiver = await db.users.find_one({"id": message_data.receiver_id})
+    receiver = await loaders.users.load(message_data.receiver_id)
     if not receiver:
         raise HTTPException(status_code=404, detail="Receiver not found")
     
@@ -1200,11 +1741,23 @@ async def send_message(message_data: MessageCreate, current_user: User = Depends
     # Store in database
     message_data_dict = prepare_for_mongo(message.dict())
     await db.messages.insert_one(message_data_dict)
+    await view_versions.bump("messages", message.sender_id, message.receiver_id)
+    
+    # Push to the receiver and to the sender's other open sessions
+    event = {"type": "message", "message": jsonable_encoder(message)}
+    await hub.publish(user_channel(message.receiver_id), event)
+    await hub.publish(user_channel(message.sender_id), event)
     
     return message
 
+@api_router.post("/chat/{contact_id}/read")
+async def mark_chat_read(contact_id: str, current_user: AuthenticatedUser = Depends(get_current_principal)):
+    """Mark all messages from a contact as read without re-reading the conversation"""
+    marked = await mark_conversation_read(current_user.id, contact_id)
+    return {"marked_read": marked}
+
 @api_router.get("/chat/unread-count")
-async def get_unread_message_count(current_user: User = Depends(get_current_user)):
+async def get_unread_message_count(current_user: AuthenticatedUser = Depends(get_current_principal)):
     """Get total unread message count for the user"""
     
     try:
@@ -1221,62 +1774,27 @@ async def get_unread_message_count(current_user: User = Depends(get_current_user
 
 # Dashboard Routes
 @api_router.get("/dashboard/stats")
-async def get_dashboard_stats(current_user: User = Depends(get_current_user)):
-    if current_user.role == "donor":
-        # Donor stats
-        active_listings = await db.food_items.count_documents({
-            "donor_id": current_user.id,
-            "status": "available"
-        })
-        
-        # Count completed donations (claimed items with completed orders)
-        total_donations = await db.orders.count_documents({
-            "donor_id": current_user.id,
-            "order_type": "claim",
-            "status": "completed"  # Only count completed donations
-        })
-        
-        # Count completed sales (sold items with completed orders)
-        total_sales = await db.orders.count_documents({
-            "donor_id": current_user.id,
-            "order_type": "purchase",
-            "status": "completed"  # Only count completed sales
-        })
-        
-        return {
-            "role": "donor",
-            "active_listings": active_listings,
-            "total_donations": total_donations,
-            "total_sales": total_sales
-        }
-    else:  # recipient
-        # Recipient stats - only count COMPLETED orders
-        claimed_items = await db.orders.count_documents({
-            "recipient_id": current_user.id,
-            "order_type": "claim",
-            "status": "completed"  # Only count completed claims
-        })
-        purchased_items = await db.orders.count_documents({
-            "recipient_id": current_user.id,
-            "order_type": "purchase",
-            "status": "completed"  # Only count completed purchases
-        })
-        total_saved = await db.orders.aggregate([
-            {"$match": {
-                "recipient_id": current_user.id, 
-                "order_type": "purchase",
-                "status": "completed",  # Only count completed orders
-                "payment_status": "completed"  # AND completed payments
-            }},
-            {"$group": {"_id": None, "total": {"$sum": "$total_amount"}}}
-        ]).to_list(1)
-        
-        return {
-            "role": "recipient",
-            "claimed_items": claimed_items,
-            "purchased_items": purchased_items,
-            "total_spent": total_saved[0]["total"] if total_saved else 0
-        }
+async def get_dashboard_stats(
+    request: Request,
+    response: Response,
+    current_user: AuthenticatedUser = Depends(get_current_principal)
+):
+    # Counters are maintained by the writes that change them (see user_stats.py)
+    role = "donor" if current_user.role == "donor" else "recipient"
+    stats = await user_stats.get(current_user.id, role)
+    counters = {"role": role, **{field: stats[field] for field in stats_fields(role)}}
+    
+    cached = not_modified(request, response, view_etag(request, current_user.id, counters))
+    if cached:
+        return cached
+    return counters
+
+# Compress complete responses above the threshold; streaming responses (SSE) are left alone
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.environ.get("COMPRESSION_MIN_SIZE", 1024))
+)
+
 # Configure CORS before including router
 app.add_middleware(
     CORSMiddleware,
@@ -1284,8 +1802,12 @@ app.add_middleware(
     allow_origins=["http://localhost:3000", "http://localhost:3001", "*"],
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag"],
 )
 
+# Outermost, so latency covers CORS and compression too
+app.add_middleware(MetricsMiddleware)
+
 # Add root route for health check
 @app.get("/")
 async def root():
@@ -1296,14 +1818,74 @@ async def root():
         "api_endpoints": "/api"
     }
 
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    payload, content_type = metrics_payload()
+    return Response(content=payload, media_type=content_type)
+
+# Slow-query diagnostics: only registered when SLOW_QUERY_DIAGNOSTICS=true, and only for signed-in users
+if slow_query_detector.enabled:
+    @app.get("/debug/slow-queries", include_in_schema=False)
+    async def slow_queries(current_user: AuthenticatedUser = Depends(get_current_principal)):
+        return slow_query_detector.report()
+
 # Add health check endpoint
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "SaverFwd Backend"}
+    return {
+        "status": "healthy",
+        "service": "SaverFwd Backend",
+        "user_cache": user_cache.stats()
+    }
 
 # Include the router in the main app
 app.include_router(api_router)
 
+class ChatControlMessage(BaseModel):
+    """A message a chat WebSocket client sends; keepalive pings are the only kind"""
+    type: Literal["ping"]
+
+# Realtime chat channel. Browsers cannot set headers on WebSocket requests,
+# so the JWT is passed as the `token` query parameter.
+@app.websocket("/ws/chat")
+async def chat_websocket(websocket: WebSocket, token: str = ""):
+    try:
+        current_user = await authenticate_token(token)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    await websocket.accept()
+    channel = user_channel(current_user.id)
+    queue = hub.subscribe(channel)
+    
+    async def forward_events():
+        while True:
+            await websocket.send_json(await queue.get())
+    
+    sender = asyncio.create_task(forward_events())
+    try:
+        # Text frames that are not valid control messages are ignored; binary frames close the socket
+        while True:
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                break
+            if frame.get("text") is None:
+                await websocket.close(code=status.WS_1003_UNSUPPORTED_DATA)
+                break
+            try:
+                message = ChatControlMessage.model_validate_json(frame["text"])
+            except ValidationError:
+                continue
+            if message.type == "ping":
+                await queue.put({"type": "pong"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        hub.unsubscribe(channel, queue)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -1313,26 +1895,64 @@ logger = logging.getLogger(__name__)
 
 # Background task for auto-expiring food items
 async def periodic_expire_task():
-    """Run auto-expire task every 5 minutes"""
-    while True:
-        try:
-            expired_count = await auto_expire_food_items()
-            if expired_count > 0:
-                print(f"Auto-expired {expired_count} food items")
-        except Exception as e:
-            print(f"Error in periodic expire task: {e}")
+    """Expire due items, then sleep until the next available item is due to expire"""
+    global next_expiry_check
+    # Only the lease holder runs this, so only it listens for expiry hints
+    hints = hub.subscribe(EXPIRY_CHANNEL)
+    relay = asyncio.create_task(relay_expiry_hints(hints))
+    try:
+        while True:
+            delay = EXPIRY_MAX_SLEEP_SECONDS
+            # A hint arriving while this run is under way triggers another run straight after it
+            next_expiry_check = None
+            expiry_wakeup.clear()
+            try:
+                expired_count = await auto_expire_food_items()
+                if expired_count > 0:
+                    EXPIRED_FOOD_ITEMS.inc(expired_count)
+                    logger.info("Auto-expired %d food items", expired_count)
+            
+                # The status_expiry index makes this a single index seek
+                next_item = await db.food_items.find_one(
+                    {"status": "available"},
+                    {"_id": 0, "expiry_time": 1},
+                    sort=[("expiry_time", 1)]
+                )
+                if next_item:
+                    next_due = next_item["expiry_time"]
+                    if isinstance(next_due, datetime):
+                        seconds_until_due = (next_due - datetime.now(timezone.utc)).total_seconds()
+                        delay = min(max(seconds_until_due, EXPIRY_MIN_SLEEP_SECONDS), EXPIRY_MAX_SLEEP_SECONDS)
+            except Exception:
+                EXPIRY_TASK_ERRORS.inc()
+                logger.exception("Error in periodic expire task")
         
-        # Wait 5 minutes before next check
-        await asyncio.sleep(300)  # 5 minutes
-
-@app.on_event("startup")
-async def startup_event():
-    """Start background tasks"""
-    asyncio.create_task(periodic_expire_task())
-    print("Background tasks started")
-
-@app.on_event("shutdown")
-async def shutdown_db_client():
+            # Sleep until the next item is due, or until a write schedules an earlier expiry
+            next_expiry_check = datetime.now(timezone.utc) + timedelta(seconds=delay)
+            try:
+                await asyncio.wait_for(expiry_wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        relay.cancel()
+        hub.unsubscribe(EXPIRY_CHANNEL, hints)
+
+# Every worker starts the job; it runs on whichever instance holds the lease
+expiry_job = LeasedJob(db, "expire_food_items", periodic_expire_task, ttl_seconds=JOB_LEASE_TTL_SECONDS)
+
+async def start_background_tasks():
+    await ensure_indexes(db)
+    await hub.start()
+    await slow_query_detector.start(client)
+    expiry_job.start()
+    logger.info("Background tasks started")
+
+async def stop_background_tasks():
+    # Jobs first, releasing their leases so another instance takes over straight away
+    await expiry_job.stop()
+    await hub.stop()
+    await slow_query_detector.stop()
+    password_hash_executor.shutdown(wait=False)
     client.close()
 
 # Main entry point
@@ -1340,4 +1960,13 @@ if __name__ == "__main__":
     import uvicorn
     # Use PORT from environment (Render provides this) or default to 8000
     port = int(os.environ.get("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    if WEB_CONCURRENCY > 1:
+        multiproc_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+        if multiproc_dir:
+            # Samples left by the workers of an earlier run would be summed in
+            for stale in Path(multiproc_dir).glob("*.db"):
+                stale.unlink()
+        # Workers are separate processes, so they get the import string rather than this app object
+        uvicorn.run("server:app", host="0.0.0.0", port=port, workers=WEB_CONCURRENCY)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=port)
@@ -0,0 +1,217 @@
+"""Opt-in slow-query and collection-scan detector.
+
+A pymongo CommandListener on the Motor client times a sample of read
+commands (find, aggregate, count, distinct). Commands slower than the
+threshold are recorded with the route that issued them, taken from the
+request context the metrics middleware sets. Commands from background
+tasks are recorded as "background". Filters are reduced to their shape, so
+no user data ends up in logs.
+
+A sample of the slow commands is re-run through `explain` (executionStats).
+A plan is flagged when it contains a COLLSCAN, or when it examines many
+more documents than it returns. Each query shape is explained at most once
+per EXPLAIN_COOLDOWN_SECONDS. Explains run on the event loop from a queue,
+because listener callbacks run on Motor's executor threads and cannot await.
+
+Every record is logged as one JSON line on the "slow_queries" logger and
+kept in a bounded buffer that GET /debug/slow-queries returns.
+"""
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Optional
+
+from pymongo import monitoring
+
+from metrics import current_request
+
+logger = logging.getLogger("slow_queries")
+
+EXPLAINABLE_COMMANDS = {"find", "aggregate", "count", "distinct"}
+# Session/transaction/routing fields that `explain` rejects or does not need
+STRIPPED_FIELDS = {"lsid", "txnNumber", "autocommit", "startTransaction", "readConcern", "writeConcern"}
+EXPLAIN_COOLDOWN_SECONDS = 300
+
+
+def query_shape(value):
+    """Replace leaf values with their type name so filters group by shape and carry no data"""
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [query_shape(item) for item in value[:3]]
+    return type(value).__name__
+
+
+def plan_stages(node):
+    """Every `stage` name in an explain document, ignoring the plans the optimizer rejected"""
+    if isinstance(node, dict):
+        if isinstance(node.get("stage"), str):
+            yield node["stage"]
+        for key, item in node.items():
+            if key != "rejectedPlans":
+                yield from plan_stages(item)
+    elif isinstance(node, list):
+        for item in node:
+            yield from plan_stages(item)
+
+
+def execution_stats(node) -> Optional[dict]:
+    """First executionStats block (top level for find, inside $cursor for older aggregate plans)"""
+    if isinstance(node, dict):
+        if isinstance(node.get("executionStats"), dict):
+            return node["executionStats"]
+        children = node.values()
+    elif isinstance(node, list):
+        children = node
+    else:
+        return None
+    for child in children:
+        found = execution_stats(child)
+        if found is not None:
+            return found
+    return None
+
+
+class SlowQueryDetector(monitoring.CommandListener):
+    def __init__(
+        self,
+        enabled: bool = False,
+        threshold_ms: float = 100,
+        sample_rate: float = 1.0,
+        explain_rate: float = 0.1,
+        examined_ratio: float = 100,
+        max_entries: int = 200,
+    ):
+        self.enabled = enabled
+        self.threshold_ms = threshold_ms
+        self.sample_rate = sample_rate
+        self.explain_rate = explain_rate
+        self.examined_ratio = examined_ratio
+        self.entries = deque(maxlen=max_entries)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._explained_at = {}
+        self._client = None
+        self._loop = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    # Listener callbacks (run on Motor's executor threads)
+    def started(self, event):
+        if not self.enabled or event.command_name not in EXPLAINABLE_COMMANDS or random.random() >= self.sample_rate:
+            return
+        request = current_request.get()
+        with self._lock:
+            self._inflight[(event.connection_id, event.request_id)] = (
+                event.database_name,
+                event.command,
+                request.route if request else "background",
+                request.method if request else None,
+            )
+
+    def succeeded(self, event):
+        self._finished(event)
+
+    def failed(self, event):
+        self._finished(event)
+
+    def _finished(self, event):
+        with self._lock:
+            started = self._inflight.pop((event.connection_id, event.request_id), None)
+        if started is None:
+            return
+        duration_ms = event.duration_micros / 1000
+        if duration_ms < self.threshold_ms:
+            return
+
+        database, command, route, method = started
+        command_name = event.command_name
+        collection = command.get(command_name)
+        shape = query_shape(command.get("pipeline") if command_name == "aggregate" else command.get("filter", command.get("query", {})))
+        entry = {
+            "time": datetime.now(timezone.utc).isoformat(),
+            "route": route,
+            "method": method,
+            "command": command_name,
+            "collection": collection,
+            "duration_ms": round(duration_ms, 2),
+            "shape": shape,
+            "sort": query_shape(command.get("sort")) if command.get("sort") else None,
+            "explain": None,
+        }
+        self.entries.append(entry)
+        logger.warning(json.dumps({"event": "slow_query", **entry}, default=str))
+
+        if self._loop is not None and random.random() < self.explain_rate:
+            shape_key = json.dumps([collection, command_name, shape], sort_keys=True, default=str)
+            now = time.monotonic()
+            if now - self._explained_at.get(shape_key, -EXPLAIN_COOLDOWN_SECONDS) >= EXPLAIN_COOLDOWN_SECONDS:
+                self._explained_at[shape_key] = now
+                self._loop.call_soon_threadsafe(self._queue.put_nowait, (database, command, entry))
+
+    # Explain worker (runs on the event loop)
+    async def start(self, client):
+        if not self.enabled:
+            return
+        self._client = client
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._explain_worker())
+        logger.info("Slow-query detector on: threshold %sms, sampling %s, explaining %s", self.threshold_ms, self.sample_rate, self.explain_rate)
+
+    async def stop(self):
+        self._loop = None
+        if self._worker:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def _explain_worker(self):
+        while True:
+            database, command, entry = await self._queue.get()
+            try:
+                entry["explain"] = await self.explain(database, command)
+                logger.warning(json.dumps({"event": "slow_query_plan", **entry}, default=str))
+            except Exception:
+                logger.exception("explain failed for slow %s on %s", entry["command"], entry["collection"])
+
+    async def explain(self, database: str, command: dict) -> dict:
+        explainable = {
+            key: value for key, value in command.items()
+            if key not in STRIPPED_FIELDS and not key.startswith("$")
+        }
+        result = await self._client[database].command({"explain": explainable, "verbosity": "executionStats"})
+
+        stages = sorted(set(plan_stages(result)))
+        stats = execution_stats(result) or {}
+        examined = stats.get("totalDocsExamined", 0)
+        returned = stats.get("nReturned", 0)
+        flags = []
+        if "COLLSCAN" in stages:
+            flags.append("COLLSCAN")
+        if examined >= self.examined_ratio and examined / max(returned, 1) >= self.examined_ratio:
+            flags.append("HIGH_EXAMINED_RATIO")
+        return {
+            "stages": stages,
+            "docs_examined": examined,
+            "keys_examined": stats.get("totalKeysExamined", 0),
+            "returned": returned,
+            "flags": flags,
+        }
+
+    def report(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "threshold_ms": self.threshold_ms,
+            "sample_rate": self.sample_rate,
+            "explain_rate": self.explain_rate,
+            "queries": list(reversed(self.entries)),
+        }
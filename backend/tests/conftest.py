@@ -0,0 +1,38 @@
+"""Integration tests against a throwaway MongoDB database.
+
+Set TEST_MONGO_URL (e.g. mongodb://localhost:27017) to run them; without it
+they are skipped. Each test gets a fresh database that is dropped afterwards.
+Run from the backend directory: python -m pytest tests
+"""
+import asyncio
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+TEST_MONGO_URL = os.environ.get("TEST_MONGO_URL")
+
+
+@pytest.fixture
+def run_with_db():
+    """run_with_db(test) runs the coroutine function test(db) on a fresh database"""
+    if not TEST_MONGO_URL:
+        pytest.skip("TEST_MONGO_URL is not set")
+    motor_asyncio = pytest.importorskip("motor.motor_asyncio")
+
+    def run(test):
+        async def main():
+            client = motor_asyncio.AsyncIOMotorClient(TEST_MONGO_URL, tz_aware=True)
+            db = client[f"saverfwd_test_{uuid.uuid4().hex[:8]}"]
+            try:
+                return await test(db)
+            finally:
+                await client.drop_database(db.name)
+                client.close()
+        return asyncio.run(main())
+
+    return run
@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("motor")
+
+from leases import Lease  # noqa: E402
+
+
+def test_acquire_renew_and_refuse(run_with_db):
+    async def test(db):
+        first = Lease(db.job_leases, "job", "first", ttl_seconds=30)
+        second = Lease(db.job_leases, "job", "second", ttl_seconds=30)
+
+        assert await first.acquire()
+        acquired = await db.job_leases.find_one({"_id": "job"})
+
+        # Renewing keeps the acquisition time and pushes the expiry out
+        await asyncio.sleep(0.05)
+        assert await first.acquire()
+        renewed = await db.job_leases.find_one({"_id": "job"})
+        assert renewed["owner"] == "first"
+        assert renewed["acquired_at"] == acquired["acquired_at"]
+        assert renewed["expires_at"] > acquired["expires_at"]
+
+        # A live lease is not taken over, and the refusal leaves it untouched
+        assert not await second.acquire()
+        assert await db.job_leases.find_one({"_id": "job"}) == renewed
+    run_with_db(test)
+
+
+def test_takeover_after_expiry(run_with_db):
+    async def test(db):
+        first = Lease(db.job_leases, "job", "first", ttl_seconds=0.2)
+        second = Lease(db.job_leases, "job", "second", ttl_seconds=30)
+
+        assert await first.acquire()
+        await asyncio.sleep(0.3)
+        assert await second.acquire()
+        assert not await first.acquire()
+        assert (await db.job_leases.find_one({"_id": "job"}))["owner"] == "second"
+    run_with_db(test)
+
+
+def test_release_hands_over(run_with_db):
+    async def test(db):
+        first = Lease(db.job_leases, "job", "first", ttl_seconds=30)
+        second = Lease(db.job_leases, "job", "second", ttl_seconds=30)
+
+        assert await first.acquire()
+        await first.release()
+        assert await second.acquire()
+    run_with_db(test)
+
+
+def test_concurrent_first_acquire_has_one_winner(run_with_db):
+    async def test(db):
+        leases = [Lease(db.job_leases, "job", f"owner-{i}", ttl_seconds=30) for i in range(5)]
+        results = await asyncio.gather(*(lease.acquire() for lease in leases))
+        assert results.count(True) == 1
+    run_with_db(test)
@@ -0,0 +1,59 @@
+import pytest
+
+pytest.importorskip("motor")
+
+from user_stats import UserStats  # noqa: E402
+
+
+async def add_listing(db, stats, donor_id, n):
+    """A listing write followed by its counter change, as server.py does it"""
+    await db.food_items.insert_one({"id": f"item-{n}", "donor_id": donor_id, "status": "available"})
+    await stats.change(donor_id, active_listings=1)
+
+
+def interleaved(stats, db, before_count: bool):
+    """Make the first compute() race with a listing created just before or just after it counts"""
+    compute = stats.compute
+    calls = []
+
+    async def racing_compute(user_id, role):
+        calls.append(user_id)
+        if len(calls) == 1 and before_count:
+            await add_listing(db, stats, user_id, "raced")
+        result = await compute(user_id, role)
+        if len(calls) == 1 and not before_count:
+            await add_listing(db, stats, user_id, "raced")
+        return result
+
+    stats.compute = racing_compute
+    return calls
+
+
+@pytest.mark.parametrize("before_count", [True, False], ids=["change-before-count", "change-after-count"])
+def test_change_during_first_read_is_kept(run_with_db, before_count):
+    async def test(db):
+        stats = UserStats(db)
+        await add_listing(db, stats, "donor", 1)  # No stats document yet: skipped, counted on first read
+        calls = interleaved(stats, db, before_count)
+
+        result = await stats.get("donor", "donor")
+        stored = await db.user_stats.find_one({"user_id": "donor"})
+
+        assert result["active_listings"] == 2
+        assert stored["active_listings"] == 2
+        assert "computing" not in stored
+        # A change between reading rev and storing the count forces one recount
+        assert len(calls) == 2
+
+        await add_listing(db, stats, "donor", 3)
+        assert (await stats.get("donor", "donor"))["active_listings"] == 3
+    run_with_db(test)
+
+
+def test_first_read_without_changes_counts_once(run_with_db):
+    async def test(db):
+        stats = UserStats(db)
+        await add_listing(db, stats, "donor", 1)
+        assert (await stats.get("donor", "donor"))["active_listings"] == 1
+        assert await stats.check(user_id="donor") == []
+    run_with_db(test)
@@ -0,0 +1,169 @@
+"""Per-user dashboard counters.
+
+One `user_stats` document per user holds the numbers the dashboard shows, so
+GET /dashboard/stats is a single key lookup instead of several counts over
+orders and food items. The writes that move a counter (listing created,
+edited, deleted or expired, item claimed, order completed or cancelled)
+apply an $inc to it, inside the order transaction when there is one.
+
+A missing document is computed from scratch on first read. The reader first
+inserts a zeroed placeholder marked `computing`, so writes landing while it
+counts have a document to $inc, then replaces the counters with its count
+only if no write moved the document's `rev` since it started. Otherwise it
+counts again, so no change is lost or counted twice. Counters are never
+created by an $inc, so a user with no document at all is counted in full on
+first read. `check` recomputes every document and can repair drift (for
+example a write that failed half way on a standalone server).
+
+Paying for an order does not move any counter: spend is only counted once
+a paid purchase is completed.
+"""
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+DONOR_FIELDS = ("active_listings", "total_donations", "total_sales")
+RECIPIENT_FIELDS = ("claimed_items", "purchased_items", "total_spent")
+
+
+def stats_fields(role: str):
+    return DONOR_FIELDS if role == "donor" else RECIPIENT_FIELDS
+
+
+class UserStats:
+    COMPUTE_ATTEMPTS = 3
+
+    def __init__(self, db):
+        self.db = db
+
+    async def get(self, user_id: str, role: str) -> dict:
+        """Counters for one user, computed and stored on first use"""
+        stats = await self.db.user_stats.find_one({"user_id": user_id}, {"_id": 0})
+        if stats is not None and not stats.get("computing"):
+            return stats
+
+        # Concurrent first reads share one placeholder; each counts, and the first to store wins
+        placeholder = {field: 0 for field in stats_fields(role)}
+        await self.db.user_stats.update_one(
+            {"user_id": user_id},
+            {"$setOnInsert": {"user_id": user_id, "role": role, **placeholder, "rev": 0, "computing": True}},
+            upsert=True
+        )
+        for _ in range(self.COMPUTE_ATTEMPTS):
+            started = await self.db.user_stats.find_one({"user_id": user_id}, {"_id": 0})
+            if not started.get("computing"):
+                return started
+            stats = await self.compute(user_id, role)
+            # A change() since `started` was read may be missing from the count; count again
+            stored = await self.db.user_stats.find_one_and_update(
+                {"user_id": user_id, "computing": True, "rev": started["rev"]},
+                {"$set": stats, "$unset": {"computing": ""}},
+                projection={"_id": 0},
+                return_document=ReturnDocument.AFTER
+            )
+            if stored is not None:
+                return stored
+        # Busy user; serve this count and let a later read store one
+        logger.warning("user_stats for %s kept changing while being counted", user_id)
+        return stats
+
+    async def compute(self, user_id: str, role: str) -> dict:
+        """Recount one user's counters with a single aggregation"""
+        completed = {"$eq": ["$status", "completed"]}
+        is_claim = {"$eq": ["$order_type", "claim"]}
+        is_purchase = {"$eq": ["$order_type", "purchase"]}
+
+        if role == "donor":
+            # Completed orders plus the donor's available listings in one pass
+            pipeline = [
+                {"$match": {"donor_id": user_id, "order_type": {"$in": ["claim", "purchase"]}, "status": "completed"}},
+                {"$project": {"_id": 0, "kind": "$order_type"}},
+                {"$unionWith": {"coll": "food_items", "pipeline": [
+                    {"$match": {"donor_id": user_id, "status": "available"}},
+                    {"$project": {"_id": 0, "kind": "listing"}}
+                ]}},
+                {"$group": {
+                    "_id": None,
+                    "active_listings": {"$sum": {"$cond": [{"$eq": ["$kind", "listing"]}, 1, 0]}},
+                    "total_donations": {"$sum": {"$cond": [{"$eq": ["$kind", "claim"]}, 1, 0]}},
+                    "total_sales": {"$sum": {"$cond": [{"$eq": ["$kind", "purchase"]}, 1, 0]}}
+                }}
+            ]
+        else:
+            # Recipient stats - only count COMPLETED orders
+            pipeline = [
+                {"$match": {"recipient_id": user_id, "order_type": {"$in": ["claim", "purchase"]}, "status": "completed"}},
+                {"$group": {
+                    "_id": None,
+                    "claimed_items": {"$sum": {"$cond": [is_claim, 1, 0]}},
+                    "purchased_items": {"$sum": {"$cond": [is_purchase, 1, 0]}},
+                    # Only completed purchases with completed payments
+                    "total_spent": {"$sum": {"$cond": [
+                        {"$and": [completed, is_purchase, {"$eq": ["$payment_status", "completed"]}]},
+                        "$total_amount",
+                        0
+                    ]}}
+                }}
+            ]
+
+        result = await self.db.orders.aggregate(pipeline).to_list(1)
+        counters = {field: 0 for field in stats_fields(role)}
+        if result:
+            counters.update({field: result[0][field] for field in stats_fields(role)})
+        return {"user_id": user_id, "role": role, **counters, "updated_at": datetime.now(timezone.utc)}
+
+    async def change(self, user_id: str, session=None, **deltas):
+        """Apply counter deltas; a user without a stats document yet is skipped"""
+        deltas = {field: delta for field, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        await self.db.user_stats.update_one(
+            {"user_id": user_id},
+            # rev tells a first read that is still counting that its count may be stale
+            {"$inc": {**deltas, "rev": 1}, "$set": {"updated_at": datetime.now(timezone.utc)}},
+            session=session
+        )
+
+    async def order_completed(self, order: dict, session=None):
+        if order["order_type"] == "claim":
+            await self.change(order["donor_id"], session, total_donations=1)
+            await self.change(order["recipient_id"], session, claimed_items=1)
+        else:
+            await self.change(order["donor_id"], session, total_sales=1)
+            spent = order.get("total_amount", 0) if order.get("payment_status") == "completed" else 0
+            await self.change(order["recipient_id"], session, purchased_items=1, total_spent=spent)
+
+    async def check(self, repair: bool = False, user_id: Optional[str] = None) -> list:
+        """Recompute stored counters and report (optionally fix) the ones that drifted.
+
+        A repair only applies if the document still holds the values that were
+        checked, so a counter moved by live traffic meanwhile is left alone.
+        """
+        # Documents still being counted by their first read are left to it
+        query = {"user_id": user_id} if user_id else {}
+        query["computing"] = {"$ne": True}
+        drifted = []
+        async for stored in self.db.user_stats.find(query, {"_id": 0}):
+            fields = stats_fields(stored["role"])
+            expected = await self.compute(stored["user_id"], stored["role"])
+            differences = {
+                field: (stored.get(field), expected[field])
+                for field in fields
+                # Spend is a float sum; summing in a different order is not drift
+                if stored.get(field) is None or abs(stored[field] - expected[field]) > 1e-6
+            }
+            if not differences:
+                continue
+
+            drifted.append({"user_id": stored["user_id"], "role": stored["role"], "differences": differences})
+            logger.warning("user_stats drift for %s: %s", stored["user_id"], differences)
+            if repair:
+                await self.db.user_stats.update_one(
+                    {"user_id": stored["user_id"], **{field: stored.get(field) for field in fields}},
+                    {"$set": {field: expected[field] for field in fields + ("updated_at",)}}
+                )
+        return drifted
@@ -0,0 +1,41 @@
+"""Change markers behind the ETags of polled list views.
+
+`view_versions` holds one document per scope: a user id, or LISTINGS for
+what every recipient sees. The document has a marker for each view that
+scope feeds, e.g. {"orders": {"n": 12, "at": <date>}}. Writes bump the markers
+of the views they change. A GET builds its ETag from a single _id lookup, so
+a poll answered with a 304 costs one key read, not a scan of the user's
+documents.
+
+A bump runs after the write it describes. A poll that lands in between can
+still get a 304 once, and the next poll sees the change. The date stored
+next to the counter keeps markers unique if the collection is dropped and
+the counters restart.
+"""
+from pymongo import UpdateOne
+
+# Scope of the shared recipient feed: available listings and the donor ratings shown with them
+LISTINGS = "listings"
+
+
+class ViewVersions:
+    def __init__(self, db):
+        self.collection = db.view_versions
+
+    async def bump(self, view: str, *scopes):
+        """Move the `view` marker of every scope given"""
+        operations = [
+            UpdateOne(
+                {"_id": scope},
+                {"$inc": {f"{view}.n": 1}, "$currentDate": {f"{view}.at": True}},
+                upsert=True
+            )
+            for scope in dict.fromkeys(scopes)
+        ]
+        if operations:
+            await self.collection.bulk_write(operations, ordered=False)
+
+    async def get(self, scope: str, *views) -> list:
+        """Current markers of `views` for one scope (None for a view never bumped)"""
+        document = await self.collection.find_one({"_id": scope}, {view: 1 for view in views}) or {}
+        return [document.get(view) for view in views]
@@ -1,5 +1,6 @@
 import React, { useState, useEffect, useRef } from 'react';
 import { useAuth } from '../App';
+import { fetchAllPages } from '../lib/pagination';
 import { toast } from 'sonner';
 import { 
   MessageCircle, 
@@ -10,8 +11,15 @@ import {
   ChevronLeft
 } from 'lucide-react';
 
+const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
+
+// Chat events are pushed over a WebSocket; the JWT goes in the query string
+// because browsers cannot set headers on WebSocket requests
+const chatSocketUrl = (token) =>
+  `${BACKEND_URL.replace(/^http/, 'ws')}/ws/chat?token=${encodeURIComponent(token)}`;
+
 const ChatWidget = () => {
-  const { api, user } = useAuth();
+  const { api, user, token } = useAuth();
   const [isOpen, setIsOpen] = useState(false);
   const [contacts, setContacts] = useState([]);
   const [activeChat, setActiveChat] = useState(null);
@@ -21,6 +29,16 @@ const ChatWidget = () => {
   const [lastMessageId, setLastMessageId] = useState(null);
   const messagesEndRef = useRef(null);
 
+  // Latest UI state for the socket event handler, which outlives renders
+  const isOpenRef = useRef(isOpen);
+  const activeChatRef = useRef(activeChat);
+  const contactsRef = useRef(contacts);
+  useEffect(() => {
+    isOpenRef.current = isOpen;
+    activeChatRef.current = activeChat;
+    contactsRef.current = contacts;
+  }, [isOpen, activeChat, contacts]);
+
   // Auto-scroll to bottom of messages
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
@@ -45,8 +63,12 @@ const ChatWidget = () => {
   const fetchConversation = async (contactId, silent = false) => {
     try {
       if (!silent) setLoading(true);
-      const response = await api.get(`/chat/${contactId}`);
-      const newMessages = response.data.messages || [];
+      // Each page holds older messages than the one before it
+      const conversation = await fetchAllPages(api, `/chat/${contactId}`, (result, page) => ({
+        ...result,
+        messages: [...page.messages, ...result.messages]
+      }));
+      const newMessages = conversation.messages || [];
       
       // Only update if messages have changed
       setMessages(prevMessages => {
@@ -64,7 +86,7 @@ const ChatWidget = () => {
         return prevMessages;
       });
       
-      setActiveChat(response.data.contact);
+      setActiveChat(conversation.contact);
       
       // Update contacts list to reflect read messages
       setContacts(prev => prev.map(contact => 
@@ -97,8 +119,8 @@ const ChatWidget = () => {
         content: newMessage.trim()
       });
 
-      // Add message to local state
-      setMessages(prev => [...prev, response.data]);
+      // Add message to local state; the pushed copy of it may have arrived first
+      setMessages(prev => prev.some(m => m.id === response.data.id) ? prev : [...prev, response.data]);
       setNewMessage('');
 
       // Update contacts list with latest message
@@ -125,33 +147,104 @@ const ChatWidget = () => {
     }
   }, [isOpen]);
 
-  // Poll for new messages every 3 seconds when chat is open
-  useEffect(() => {
-    if (!isOpen) return;
-
-    const interval = setInterval(() => {
-      if (activeChat) {
-        fetchConversation(activeChat.user_id, true); // Silent mode to avoid loading spinner
-      } else {
-        // Also refresh contacts list to show new messages
-        fetchChatData();
+  // Apply a pushed chat event to local state
+  const handleChatEvent = (event) => {
+    if (event.type === 'message') {
+      const message = event.message;
+      const incoming = message.sender_id !== user.id;
+      const contactId = incoming ? message.sender_id : message.receiver_id;
+      const isActive = activeChatRef.current?.user_id === contactId;
+
+      if (isActive) {
+        setMessages(prev => prev.some(m => m.id === message.id) ? prev : [...prev, message]);
+        if (incoming) {
+          api.post(`/chat/${contactId}/read`).catch(() => {});
+        }
       }
-    }, 8000);
 
-    return () => clearInterval(interval);
-  }, [isOpen, activeChat]);
+      if (!contactsRef.current.some(contact => contact.user_id === contactId)) {
+        // First message from a new contact - reload the list to pick up their profile
+        if (isOpenRef.current) fetchChatData();
+        return;
+      }
+      setContacts(prev => prev.map(contact =>
+        contact.user_id === contactId
+          ? {
+              ...contact,
+              last_message: message.content,
+              last_message_time: message.timestamp,
+              unread_count: incoming && !isActive ? contact.unread_count + 1 : contact.unread_count
+            }
+          : contact
+      ));
+    } else if (event.type === 'read') {
+      setMessages(prev => prev.map(m =>
+        m.receiver_id === event.reader_id ? { ...m, is_read: true } : m
+      ));
+    } else if (event.type === 'resync') {
+      resyncChat();
+    }
+  };
 
+  // Catch up on anything missed while the socket was down
+  const resyncChat = () => {
+    if (!isOpenRef.current) return;
+    if (activeChatRef.current) {
+      fetchConversation(activeChatRef.current.user_id, true);
+    } else {
+      fetchChatData();
+    }
+  };
 
-  // Poll for contacts data every 15 seconds to show new messages and update last message
+  // One long-lived push connection per session instead of polling
   useEffect(() => {
-    if (!isOpen || activeChat) return; // Only when contacts list is visible
+    if (!user || !token || !BACKEND_URL) return;
 
-    const interval = setInterval(() => {
-      fetchChatData();
-    }, 30000);
+    let socket;
+    let retryTimer;
+    let pingTimer;
+    let retryDelay = 1000;
+    let stopped = false;
+
+    const connect = () => {
+      socket = new WebSocket(chatSocketUrl(token));
+
+      socket.onopen = () => {
+        retryDelay = 1000;
+        resyncChat();
+        pingTimer = setInterval(() => {
+          if (socket.readyState === WebSocket.OPEN) {
+            socket.send(JSON.stringify({ type: 'ping' }));
+          }
+        }, 25000);
+      };
+
+      socket.onmessage = (e) => {
+        try {
+          handleChatEvent(JSON.parse(e.data));
+        } catch (error) {
+          console.error('Bad chat event:', error);
+        }
+      };
+
+      socket.onclose = () => {
+        clearInterval(pingTimer);
+        if (stopped) return;
+        // Reconnect with exponential backoff
+        retryTimer = setTimeout(connect, retryDelay);
+        retryDelay = Math.min(retryDelay * 2, 30000);
+      };
+    };
+
+    connect();
 
-    return () => clearInterval(interval);
-  }, [isOpen, activeChat]);
+    return () => {
+      stopped = true;
+      clearTimeout(retryTimer);
+      clearInterval(pingTimer);
+      socket?.close();
+    };
+  }, [user?.id, token]);
 
   const formatTime = (timestamp) => {
     const date = new Date(timestamp);
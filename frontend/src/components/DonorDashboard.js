@@ -1,6 +1,9 @@
 import React, { useState, useEffect, useCallback } from 'react';
 import { useAuth } from '../App';
 import { useSmartRefresh } from '../hooks/useSmartRefresh';
+import { useFoodItemFeed } from '../hooks/useFoodItemFeed';
+import { usePagedRefresh } from '../hooks/usePagedRefresh';
+import { fetchAllPages } from '../lib/pagination';
 import { Button } from './ui/button';
 import { Card, CardContent, CardHeader, CardTitle } from './ui/card';
 import { Badge } from './ui/badge';
@@ -60,25 +63,22 @@ const DonorDashboard = () => {
     data: foodItems,
     loading: foodItemsLoading,
     refresh: refreshFoodItems
-  } = useSmartRefresh(
+  } = useFoodItemFeed(
     useCallback(async () => {
       const response = await api.get('/food-items');
       return response.data;
-    }, [api]),
-    10000
+    }, [api])
   );
 
+  // Polls the newest page of orders; older ones load from the "Load older orders" button
   const {
     data: orders,
     loading: ordersLoading,
-    refresh: refreshOrders
-  } = useSmartRefresh(
-    useCallback(async () => {
-      const response = await api.get('/orders');
-      return response.data;
-    }, [api]),
-    8000
-  );
+    refresh: refreshOrders,
+    hasMore: hasMoreOrders,
+    loadMore: loadMoreOrders,
+    loadingMore: loadingMoreOrders
+  } = usePagedRefresh('/orders', 8000);
 
   // Temporarily disable recipients until API endpoint is created
   const recipients = [];
@@ -146,8 +146,12 @@ const DonorDashboard = () => {
   const fetchAllOrdersForRecipient = useCallback(async (recipientId) => {
     setLoadingAllOrders(true);
     try {
-      const response = await api.get(`/donors/recipients/${recipientId}`);
-      setSelectedRecipientAllOrders(response.data);
+      // recent_orders is paged; collect the recipient's full order history
+      const details = await fetchAllPages(api, `/donors/recipients/${recipientId}`, (result, page) => ({
+        ...result,
+        recent_orders: [...result.recent_orders, ...page.recent_orders]
+      }));
+      setSelectedRecipientAllOrders(details);
     } catch (error) {
       console.error('Failed to fetch all orders:', error);
       toast.error('Failed to load all orders');
@@ -979,6 +983,18 @@ const DonorDashboard = () => {
                       <p className="text-gray-600">Orders and claims will appear here when recipients interact with your listings</p>
                     </div>
                   )}
+
+                  {hasMoreOrders && (
+                    <div className="text-center">
+                      <Button
+                        variant="outline"
+                        disabled={loadingMoreOrders}
+                        onClick={() => loadMoreOrders().catch(() => toast.error('Failed to load older orders'))}
+                      >
+                        {loadingMoreOrders ? 'Loading...' : 'Load older orders'}
+                      </Button>
+                    </div>
+                  )}
                 </>
               )}
             </div>
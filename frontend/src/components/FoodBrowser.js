@@ -1,6 +1,6 @@
 import React, { useState, useEffect, useCallback } from 'react';
 import { useAuth } from '../App';
-import { useSmartRefresh } from '../hooks/useSmartRefresh';
+import { useFoodItemFeed } from '../hooks/useFoodItemFeed';
 import { Button } from './ui/button';
 import { Card, CardContent, CardHeader, CardTitle } from './ui/card';
 import { Badge } from './ui/badge';
@@ -43,12 +43,11 @@ const FoodBrowser = () => {
     data: foodItems,
     loading,
     refresh: refreshFoodItems
-  } = useSmartRefresh(
+  } = useFoodItemFeed(
     useCallback(async () => {
       const response = await api.get('/food-items');
       return response.data;
-    }, [api]),
-    8000
+    }, [api])
   );
 
   useEffect(() => {
@@ -1,6 +1,7 @@
 import React, { useState, useEffect, useCallback } from 'react';
 import { useAuth } from '../App';
 import { useSmartRefresh } from '../hooks/useSmartRefresh';
+import { usePagedRefresh } from '../hooks/usePagedRefresh';
 import { Button } from './ui/button';
 import { Card, CardContent, CardHeader, CardTitle } from './ui/card';
 import { Badge } from './ui/badge';
@@ -44,18 +45,15 @@ const RecipientDashboard = () => {
     30000
   );
   
-  // Smart refresh for orders
+  // Smart refresh for orders; polls the newest page, older ones load on demand
   const {
     data: orders,
     loading: ordersLoading,
-    refresh: refreshOrders
-  } = useSmartRefresh(
-    useCallback(async () => {
-      const response = await api.get('/orders');
-      return response.data;
-    }, [api]),
-    10000
-  );
+    refresh: refreshOrders,
+    hasMore: hasMoreOrders,
+    loadMore: loadMoreOrders,
+    loadingMore: loadingMoreOrders
+  } = usePagedRefresh('/orders', 10000);
   
   // Smart refresh for ratings
   const {
@@ -422,6 +420,18 @@ const RecipientDashboard = () => {
                   </Link>
                 </div>
               )}
+
+              {hasMoreOrders && (
+                <div className="text-center">
+                  <Button
+                    variant="outline"
+                    disabled={loadingMoreOrders}
+                    onClick={() => loadMoreOrders().catch(() => toast.error('Failed to load older orders'))}
+                  >
+                    {loadingMoreOrders ? 'Loading...' : 'Load older orders'}
+                  </Button>
+                </div>
+              )}
             </div>
           </TabsContent>
 
@@ -495,6 +505,18 @@ const RecipientDashboard = () => {
                   <p className="text-gray-600">Your completed orders will appear here</p>
                 </div>
               )}
+
+              {hasMoreOrders && (
+                <div className="text-center">
+                  <Button
+                    variant="outline"
+                    disabled={loadingMoreOrders}
+                    onClick={() => loadMoreOrders().catch(() => toast.error('Failed to load older orders'))}
+                  >
+                    {loadingMoreOrders ? 'Loading...' : 'Load older orders'}
+                  </Button>
+                </div>
+              )}
             </div>
           </TabsContent>
         </Tabs>
@@ -0,0 +1,106 @@
+import { useState, useEffect, useCallback, useRef } from 'react';
+import { useAuth } from '../App';
+
+const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
+const FEED_EVENTS = ['created', 'updated', 'claimed', 'expired', 'cancelled', 'deleted', 'resync'];
+
+// Apply one listing change to the current list
+const applyFoodItemEvent = (items, event, role) => {
+  const index = items.findIndex(item => item.id === event.item_id);
+
+  // Recipients only list available items
+  if (role === 'recipient' && (event.status !== 'available' || !event.item)) {
+    return index === -1 ? items : items.filter(item => item.id !== event.item_id);
+  }
+
+  if (event.type === 'deleted') {
+    return items.filter(item => item.id !== event.item_id);
+  }
+
+  if (event.item) {
+    if (index === -1) return [event.item, ...items];
+    const next = [...items];
+    next[index] = { ...items[index], ...event.item };
+    return next;
+  }
+
+  // Status-only change (e.g. claimed, bulk expiry)
+  if (index === -1) return items;
+  const next = [...items];
+  next[index] = { ...items[index], status: event.status };
+  return next;
+};
+
+// Loads the food item list once, then keeps it current from the
+// /food-items/stream Server-Sent Events feed instead of polling.
+export const useFoodItemFeed = (fetchFunction) => {
+  const { user, token } = useAuth();
+  const [data, setData] = useState(null);
+  const [loading, setLoading] = useState(true);
+  const [error, setError] = useState(null);
+  const roleRef = useRef(user?.role);
+  roleRef.current = user?.role;
+
+  const fetchData = useCallback(async () => {
+    if (!user) {
+      setLoading(false);
+      return;
+    }
+
+    try {
+      const result = await fetchFunction();
+      setData(result);
+      setError(null);
+    } catch (err) {
+      console.error('Error fetching data:', err);
+      setError(err);
+      setData(prev => prev ?? []);
+    } finally {
+      setLoading(false);
+    }
+  }, [fetchFunction, user]);
+
+  const stableUser = user?.id;
+
+  useEffect(() => {
+    if (!stableUser || !token || !BACKEND_URL) return;
+
+    fetchData();
+
+    const source = new EventSource(
+      `${BACKEND_URL}/api/food-items/stream?token=${encodeURIComponent(token)}`
+    );
+    let hasConnected = false;
+
+    // EventSource reconnects on its own; reload once after a reconnect to
+    // pick up anything missed while disconnected
+    source.onopen = () => {
+      if (hasConnected) fetchData();
+      hasConnected = true;
+    };
+
+    const handleEvent = (e) => {
+      try {
+        const event = JSON.parse(e.data);
+        if (event.type === 'resync') {
+          fetchData();
+          return;
+        }
+        setData(prev => applyFoodItemEvent(prev || [], event, roleRef.current));
+      } catch (err) {
+        console.error('Bad food item event:', err);
+      }
+    };
+
+    FEED_EVENTS.forEach(type => source.addEventListener(type, handleEvent));
+
+    return () => source.close();
+  }, [fetchData, stableUser, token]);
+
+  const refresh = useCallback(() => {
+    setLoading(true);
+    fetchData();
+  }, [fetchData]);
+
+  return { data, loading, error, refresh };
+};
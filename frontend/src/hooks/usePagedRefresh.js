@@ -0,0 +1,59 @@
+import { useState, useEffect, useCallback, useMemo, useRef } from 'react';
+import { useAuth } from '../App';
+import { useSmartRefresh } from './useSmartRefresh';
+import { fetchPage } from '../lib/pagination';
+
+// Keep the newer copy of each item; newer items go first (lists are newest first)
+const mergeById = (newer, older) => {
+  const ids = new Set(newer.map(item => item.id));
+  return [...newer, ...older.filter(item => !ids.has(item.id))];
+};
+
+// Polls only the newest page of a paged list, so a long history costs one
+// request per poll instead of one per page. Older pages load on demand with
+// loadMore() and stay in the list; items that scroll off the newest page
+// between polls are kept too, so nothing drops out of view. Only the newest
+// page is refreshed, so older items show their state as of when they loaded.
+export const usePagedRefresh = (path, interval) => {
+  const { api } = useAuth();
+  // Loaded items that are not on the newest page
+  const [older, setOlder] = useState([]);
+  // Cursor after the oldest loaded item; undefined until the first page arrives
+  const [cursor, setCursor] = useState(undefined);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const previousNewest = useRef([]);
+
+  const { data: newest, loading, error, refresh } = useSmartRefresh(
+    useCallback(() => fetchPage(api, path), [api, path]),
+    interval
+  );
+  // useSmartRefresh falls back to [] when the very first load fails
+  const newestItems = newest?.items;
+
+  useEffect(() => {
+    if (!newestItems) return;
+    const dropped = previousNewest.current;
+    previousNewest.current = newestItems;
+    setOlder(prev => mergeById(dropped, prev).filter(item => !newestItems.some(n => n.id === item.id)));
+    setCursor(prev => (prev === undefined ? newest.nextCursor : prev));
+  }, [newestItems]);
+
+  const loadMore = useCallback(async () => {
+    if (!cursor || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      const page = await fetchPage(api, path, cursor);
+      setOlder(prev => mergeById(prev, page.items));
+      setCursor(page.nextCursor);
+    } finally {
+      setLoadingMore(false);
+    }
+  }, [api, path, cursor, loadingMore]);
+
+  const data = useMemo(
+    () => (newest ? mergeById(newestItems || [], older) : null),
+    [newest, newestItems, older]
+  );
+
+  return { data, loading, error, refresh, hasMore: Boolean(cursor), loadMore, loadingMore };
+};
@@ -0,0 +1,24 @@
+// List endpoints return one page at a time and send the cursor for the next
+// page in the X-Next-Cursor header. fetchPage reads one page and that cursor
+// (null on the last page); polled lists use it to refresh only their newest
+// page (see usePagedRefresh). fetchAllPages follows the cursor until the server
+// stops sending one, for one-off loads that show a whole list.
+// mergePage(result, page) combines the pages; by default arrays are appended.
+const PAGE_SIZE = 100; // the server's maximum
+
+export async function fetchPage(api, path, cursor = null) {
+  const params = cursor ? { limit: PAGE_SIZE, cursor } : { limit: PAGE_SIZE };
+  const response = await api.get(path, { params });
+  return { items: response.data, nextCursor: response.headers['x-next-cursor'] || null };
+}
+
+export async function fetchAllPages(api, path, mergePage = (result, page) => [...result, ...page]) {
+  let result = null;
+  let cursor = null;
+  do {
+    const page = await fetchPage(api, path, cursor);
+    result = result === null ? page.items : mergePage(result, page.items);
+    cursor = page.nextCursor;
+  } while (cursor);
+  return result;
+}